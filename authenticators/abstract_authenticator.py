@@ -1,4 +1,5 @@
 from abc import ABCMeta, abstractmethod
+import numpy as np
 
 
 class AbstractAuthenticator(metaclass=ABCMeta):
@@ -17,3 +18,21 @@ class AbstractAuthenticator(metaclass=ABCMeta):
         :param customer:    the customer making a transaction
         :return:            boolean, whether or not to authorise the transaction
         """
+
+    def authorise_batch(self, transactions, model):
+        """
+        Decide for all transactions of one step at once which ones need a second authentication.
+        The model then asks these customers for authentication (once) and applies the outcomes.
+        By default, this calls authorise_transaction for every transaction (which asks for authentication itself);
+        authenticators that can decide on the arrays alone can override it to skip the per-customer handles.
+        :param transactions:    dict with one array per field ('amount', 'merchant_id', 'country', 'currency',
+                                'card_id', 'fraudster'), and a sequence with a handle per customer ('customers')
+                                that has the same attributes as the customer passed to authorise_transaction;
+                                countries and currencies are integer codes into model.country_labels and
+                                model.currency_labels
+        :param model:           the transaction model
+        :return:                boolean array, True for the transactions that need a second authentication
+        """
+        for customer in transactions['customers']:
+            self.authorise_transaction(customer)
+        return np.zeros(len(transactions['amount']), dtype=bool)
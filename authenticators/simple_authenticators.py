@@ -1,4 +1,5 @@
 from authenticators.abstract_authenticator import AbstractAuthenticator
+import numpy as np
 
 
 class OracleAuthenticator(AbstractAuthenticator):
@@ -6,16 +7,25 @@ class OracleAuthenticator(AbstractAuthenticator):
         if customer.fraudster:
             customer.give_authentication()
 
+    def authorise_batch(self, transactions, model):
+        return transactions['fraudster'] == 1
+
 
 class NeverSecondAuthenticator(AbstractAuthenticator):
     def authorise_transaction(self, customer):
         pass
 
+    def authorise_batch(self, transactions, model):
+        return np.zeros(len(transactions['amount']), dtype=bool)
+
 
 class AlwaysSecondAuthenticator(AbstractAuthenticator):
     def authorise_transaction(self, customer):
         customer.give_authentication()
 
+    def authorise_batch(self, transactions, model):
+        return np.ones(len(transactions['amount']), dtype=bool)
+
 
 class HeuristicAuthenticator(AbstractAuthenticator):
     def __init__(self, thresh=50):
@@ -26,6 +36,9 @@ class HeuristicAuthenticator(AbstractAuthenticator):
         if customer.curr_amount > self.thresh:
             customer.give_authentication()
 
+    def authorise_batch(self, transactions, model):
+        return transactions['amount'] > self.thresh
+
     def take_action(self, customer):
         if customer.curr_amount > self.thresh:
             return 1
@@ -36,3 +49,6 @@ class RandomAuthenticator(AbstractAuthenticator):
         # ask for second authentication in 50% of the cases
         if customer.model.random_state.uniform(0, 1, 1)[0] < 0.5:
             customer.give_authentication()
+
+    def authorise_batch(self, transactions, model):
+        return model.random_state.uniform(0, 1, len(transactions['amount'])) < 0.5
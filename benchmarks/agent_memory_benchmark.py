@@ -0,0 +1,79 @@
+"""
+Measures the memory per agent and the agent creation rate of the TransactionModel,
+by adding customers/fraudsters to a small model. The memory is measured by tracing the allocations,
+and the creation rate in a separate run without tracing (tracing slows down the allocations).
+
+Usage: python benchmarks/agent_memory_benchmark.py [--num-agents 10000] [--max-bytes 4000] [--min-rate 2000]
+Exits with a non-zero status if an agent needs more bytes than --max-bytes,
+or if fewer than --min-rate agents are created per second.
+"""
+from os.path import dirname, abspath
+import argparse
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from simulator import parameters
+from simulator.transaction_model import TransactionModel
+
+
+def get_model():
+    model_parameters = parameters.get_default_parameters()
+    model_parameters['num_customers'] = 10
+    model_parameters['num_fraudsters'] = 10
+    return TransactionModel(model_parameters)
+
+
+def add_agents(model, num_agents, fraudster):
+    if fraudster:
+        model.add_fraudsters(num_agents)
+    else:
+        model.add_customers(num_agents)
+
+
+def measure(num_agents, fraudster):
+    """
+    :param num_agents:  the number of agents to create
+    :param fraudster:   whether to create fraudsters (True) or genuine customers (False)
+    :return:            bytes per agent, agents created per second
+    """
+    model = get_model()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    add_agents(model, num_agents, fraudster)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    model = get_model()
+    start = time.perf_counter()
+    add_agents(model, num_agents, fraudster)
+    duration = time.perf_counter() - start
+
+    return (after - before) / num_agents, num_agents / duration
+
+
+def run(num_agents, max_bytes, min_rate):
+    ok = True
+    for fraudster, name in [(False, 'customers'), (True, 'fraudsters')]:
+        bytes_per_agent, rate = measure(num_agents, fraudster)
+        print('{}: {:.0f} bytes per agent, {:.0f} agents per second (targets {} bytes, {} per second)'.format(
+            name, bytes_per_agent, rate, max_bytes, min_rate))
+        if bytes_per_agent > max_bytes:
+            print('FAIL: {} need more memory than the target'.format(name))
+            ok = False
+        if rate < min_rate:
+            print('FAIL: {} are created slower than the target'.format(name))
+            ok = False
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num-agents', type=int, default=10000)
+    parser.add_argument('--max-bytes', type=float, default=4000, help='maximal number of bytes per agent')
+    parser.add_argument('--min-rate', type=float, default=2000, help='minimal number of agents created per second')
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.num_agents, args.max_bytes, args.min_rate) else 1)
@@ -0,0 +1,60 @@
+"""
+Measures how long it takes to import the simulator in a fresh python process,
+and checks that it does not pull in the plotting library.
+
+Usage: python benchmarks/startup_benchmark.py [--module simulator.transaction_model] [--target 1.0] [--repeat 5]
+Exits with a non-zero status if the median import time is above the target (in seconds).
+"""
+from os.path import dirname, abspath
+import argparse
+import json
+import subprocess
+import sys
+
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+# run in a fresh interpreter: import the module, and report the time and which heavy modules got loaded
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+print(json.dumps({{'seconds': duration, 'matplotlib': 'matplotlib' in sys.modules}}))
+"""
+
+
+def measure_import(module):
+    """
+    :return:    dict with the import time in seconds, and whether matplotlib was imported
+    """
+    output = subprocess.check_output([sys.executable, '-c', MEASURE.format(module=module)], cwd=ROOT)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def run(module, target, repeat):
+    results = [measure_import(module) for _ in range(repeat)]
+    seconds = sorted(r['seconds'] for r in results)
+    median = seconds[len(seconds) // 2]
+
+    print('import {}: median {:.3f}s, min {:.3f}s, max {:.3f}s (target {:.3f}s)'.format(
+        module, median, seconds[0], seconds[-1], target))
+
+    ok = True
+    if any(r['matplotlib'] for r in results):
+        print('FAIL: importing {} imports matplotlib'.format(module))
+        ok = False
+    if median > target:
+        print('FAIL: import is slower than the target')
+        ok = False
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='simulator.transaction_model')
+    parser.add_argument('--target', type=float, default=1.0, help='maximal median import time in seconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.module, args.target, args.repeat) else 1)
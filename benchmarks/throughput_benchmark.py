@@ -0,0 +1,151 @@
+"""
+Runs the simulator for a fixed number of steps at several population scales, and reports per scale
+the steps and transactions per second, the peak memory (RSS) and the time per phase of a step.
+Every scale runs in a fresh python process, so that the peak memory is measured per scale.
+The results are written to a JSON file, so they can be compared across commits.
+
+The default parameters are used (read from data/simulator_input), with the number of fraudsters
+and the number of transactions per year scaled with the number of customers. The number of merchants
+is fixed by the input data (there is an amount distribution per merchant), so it is not scaled.
+
+Usage: python benchmarks/throughput_benchmark.py [--scales 1000 10000 100000 1000000] [--steps 48]
+                                                 [--model agents|vectorized] [--scheduler random|event]
+                                                 [--output benchmarks/results/throughput.json]
+"""
+from os.path import dirname, abspath, join
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# the number of customers in the default parameters, relative to which the other parameters are scaled
+DEFAULT_NUM_CUSTOMERS = 3333
+
+
+def get_parameters(num_customers):
+    """
+    :param num_customers:   the number of customers at the start of the simulation
+    :return:                the default parameters, scaled to the given number of customers
+    """
+    from simulator import parameters
+
+    model_parameters = parameters.get_default_parameters()
+    scale = num_customers / DEFAULT_NUM_CUSTOMERS
+    model_parameters['num_customers'] = num_customers
+    model_parameters['num_fraudsters'] = max(1, int(round(model_parameters['num_fraudsters'] * scale)))
+    model_parameters['trans_per_year'] = model_parameters['trans_per_year'] * scale
+    return model_parameters
+
+
+def get_model(model_parameters, model_type, scheduler_type):
+    from simulator.transaction_model import TransactionModel
+    from simulator.vectorized_model import VectorizedTransactionModel
+    from simulator.event_scheduler import NextTransactionScheduler
+
+    if model_type == 'vectorized':
+        return VectorizedTransactionModel(model_parameters)
+    scheduler = NextTransactionScheduler() if scheduler_type == 'event' else None
+    return TransactionModel(model_parameters, scheduler=scheduler)
+
+
+def get_peak_rss():
+    """
+    :return:    the peak resident set size of this process in bytes
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_scale(num_customers, num_steps, model_type, scheduler_type):
+    """
+    Run the simulation at one scale (in this process)
+    :return:    dict with the results
+    """
+    from simulator.step_profiler import StepProfiler
+
+    model_parameters = get_parameters(num_customers)
+
+    start = time.perf_counter()
+    model = get_model(model_parameters, model_type, scheduler_type)
+    setup_seconds = time.perf_counter() - start
+
+    profiler = StepProfiler()
+    model.set_profiler(profiler)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        model.step()
+    seconds = time.perf_counter() - start
+
+    summary = profiler.get_summary()
+    return {'num_customers': num_customers,
+            'num_fraudsters': model_parameters['num_fraudsters'],
+            'num_merchants': model_parameters['num_merchants'],
+            'num_steps': num_steps,
+            'setup_seconds': setup_seconds,
+            'seconds': seconds,
+            'steps_per_second': num_steps / seconds,
+            'transactions_per_second': float(summary['transactions']) / seconds,
+            'peak_rss_bytes': get_peak_rss(),
+            'phase_seconds': {phase: float(summary[phase]) for phase in StepProfiler.PHASES},
+            'counts': {name: int(summary[name]) for name in StepProfiler.COUNTS}}
+
+
+def measure_scale(num_customers, num_steps, model_type, scheduler_type):
+    """
+    Run one scale in a fresh python process
+    :return:    dict with the results
+    """
+    output = subprocess.check_output([sys.executable, abspath(__file__), '--worker',
+                                      '--scales', str(num_customers), '--steps', str(num_steps),
+                                      '--model', model_type, '--scheduler', scheduler_type], cwd=ROOT)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, num_steps, model_type, scheduler_type, output):
+    results = []
+    for num_customers in scales:
+        result = measure_scale(num_customers, num_steps, model_type, scheduler_type)
+        results.append(result)
+
+        phases = ', '.join('{} {:.2f}s'.format(phase, s) for phase, s in result['phase_seconds'].items())
+        print('{:>8} customers: {:.2f} steps/s, {:.0f} transactions/s, peak RSS {:.0f} MB, setup {:.1f}s ({})'.format(
+            num_customers, result['steps_per_second'], result['transactions_per_second'],
+            result['peak_rss_bytes'] / 2**20, result['setup_seconds'], phases))
+
+    os.makedirs(dirname(abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': get_commit(), 'model': model_type, 'scheduler': scheduler_type,
+                   'python': sys.version.split()[0], 'results': results}, f, indent=2)
+    print('results written to', output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='numbers of customers')
+    parser.add_argument('--steps', type=int, default=48, help='number of steps (hours) per scale')
+    parser.add_argument('--model', choices=['agents', 'vectorized'], default='agents')
+    parser.add_argument('--scheduler', choices=['random', 'event'], default='random',
+                        help='scheduler of the agent-based model (RandomActivation or NextTransactionScheduler)')
+    parser.add_argument('--output', default=join(ROOT, 'benchmarks', 'results', 'throughput.json'))
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scale(args.scales[0], args.steps, args.model, args.scheduler)))
+    else:
+        run(args.scales, args.steps, args.model, args.scheduler, args.output)
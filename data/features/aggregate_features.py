@@ -89,22 +89,15 @@ class AggregateFeatures:
         more hierarchical models (like Neural Networks or Decision Trees) might be able to combine them a bit better.
         (based on my intuition at least, no fancy citations for this :( )
         '''
-        data["CountryFraudRatio"] = data.apply(
-            lambda row: self.get_country_fraud_ratio(row=row), axis=1
-        )
-        data["CountrySufficientSampleSize"] = data.apply(
-            lambda row: self.is_country_sample_size_sufficient(row=row), axis=1
-        )
+        data["CountryFraudRatio"] = self.map_column(data["Country"], self.get_country_fraud_ratio)
+        data["CountrySufficientSampleSize"] = self.map_column(data["Country"], self.is_country_sample_size_sufficient)
 
         '''
         The following features are not described in any papers specifically
         '''
-        data["CurrencyFraudRatio"] = data.apply(
-            lambda row: self.get_currency_fraud_ratio(row=row), axis=1
-        )
-        data["CurrencySufficientSampleSize"] = data.apply(
-            lambda row: self.is_currency_sample_size_sufficient(row=row), axis=1
-        )
+        # like get_currency_fraud_ratio(row=row), this looks up the Country of the row
+        data["CurrencyFraudRatio"] = self.map_column(data["Country"], self.get_currency_fraud_ratio)
+        data["CurrencySufficientSampleSize"] = self.map_column(data["Currency"], self.is_currency_sample_size_sufficient)
         data = self.add_date_features(data)
 
         '''
@@ -121,6 +114,27 @@ class AggregateFeatures:
 
         return data
 
+    def map_column(self, column, function):
+        """
+        Applies a function to every value of a discrete column. The function is only called once per
+        distinct value; for a categorical column (e.g. Country and Currency in the simulator logs), the
+        results are looked up by the integer codes of the column.
+
+        :param column:
+            Column (Series) to map
+        :param function:
+            Function of a single value
+        :return:
+            Array with the result per row
+        """
+        if hasattr(column, "cat"):
+            results = np.array([function(category) for category in column.cat.categories] + [function(None)])
+            # missing values have code -1, which picks the result for None
+            return results[column.cat.codes.values]
+
+        values, codes = np.unique(column.values, return_inverse=True)
+        return np.array([function(value) for value in values])[codes]
+
     def add_date_features(self, data):
         """
         Adds a few general features computed from the Local_Date (sin and cos for hour in day and month in year)
@@ -440,6 +454,18 @@ class AggregateFeatures:
         all_transactions_dict = {}
         fraud_transactions_dict = {}
 
+        values = training_data[column]
+        if hasattr(values, "cat"):
+            # dictionary-encoded column: count the integer codes instead of hashing the labels
+            codes = values.cat.codes.values
+            is_fraud = (training_data["Target"] == 1).values
+            all_counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+            fraud_counts = np.bincount(codes[(codes >= 0) & is_fraud], minlength=len(values.cat.categories))
+            for code in np.flatnonzero(all_counts):
+                all_transactions_dict[values.cat.categories[code]] = all_counts[code]
+                fraud_transactions_dict[values.cat.categories[code]] = fraud_counts[code]
+            return all_transactions_dict, fraud_transactions_dict
+
         # Thanks Kasper for implementation :D [3]
         fraud_list = training_data.loc[training_data["Target"] == 1]
         fraud_dict = fraud_list[column].value_counts()
@@ -134,4 +134,5 @@ dataset = dataset[['Global_Date', 'Local_Date', 'CardID', 'MerchantID', 'Amount'
 
 print(dataset.head())
 
+utils_data.make_folder(utils_data.FOLDER_REAL_DATA)
 dataset.to_csv(utils_data.FILE_REAL_LOG, index_label=False)
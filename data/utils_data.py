@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from os.path import join, dirname, exists
 from os import makedirs, pardir
 
@@ -10,16 +9,23 @@ FOLDER_REAL_DATA_ANALYSIS = join(FOLDER_REAL_DATA, 'analysis')
 
 FOLDER_SIMULATOR_LOG = join(pardir, 'experiments/results')
 
-# create the above folders if they don't exist yet
-for folder in [FOLDER_REAL_DATA, FOLDER_SIMULATOR_INPUT, FOLDER_SIMULATOR_LOG, FOLDER_REAL_DATA_ANALYSIS]:
-    if not exists(folder):
-        makedirs(folder)
-
 FILE_ANONYMIZED_DATASET = join(FOLDER_REAL_DATA, 'anonymized_dataset.csv')
 FILE_REAL_LOG = join(FOLDER_REAL_DATA, 'transaction_log.csv')
 FILE_SIMULATOR_LOG = join(FOLDER_SIMULATOR_LOG, 'transaction_log.csv')
 
 
+def make_folder(folder):
+    """
+    Create one of the above folders if it doesn't exist yet
+    (this is done when writing to it, not on import, so importing this module has no side effects)
+    :param folder:
+    :return: the folder
+    """
+    if not exists(folder):
+        makedirs(folder)
+    return folder
+
+
 def get_dataset(file):
     """
     Returns the dataset (full), and subsets for non-fraud and fraud only.
@@ -128,7 +134,7 @@ def get_transaction_dist(col_name):
     trans_count /= np.sum(trans_count.values, axis=0)
 
     # save
-    trans_count.to_csv(join(FOLDER_SIMULATOR_INPUT, 'fract-dist.csv'.format(col_name)), index_label=False)
+    trans_count.to_csv(join(make_folder(FOLDER_SIMULATOR_INPUT), 'fract-dist.csv'.format(col_name)), index_label=False)
 
     # print
     print(col_name)
@@ -140,6 +146,9 @@ def get_transaction_dist(col_name):
 
 def plot_hist_num_transactions(trans_frac, col_name):
     """ method to plot histogram of number of transactions for a column """
+    # matplotlib is only imported when we actually plot
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 7))
     for i in range(3):
         plt.subplot(3, 1, i+1)
@@ -147,12 +156,14 @@ def plot_hist_num_transactions(trans_frac, col_name):
         plt.ylabel('num transactions')
         if i == 2:
             plt.xlabel(col_name)
-    plt.savefig(join(FOLDER_SIMULATOR_INPUT, '{}_num-trans_hist'.format(col_name)))
+    plt.savefig(join(make_folder(FOLDER_SIMULATOR_INPUT), '{}_num-trans_hist'.format(col_name)))
     plt.close()
 
 
 def plot_bar_trans_prob(trans_frac, col_name, file_name=None):
     """ method to plot bar plot of number of transactions for a column """
+    import matplotlib.pyplot as plt
+
     plt.figure()
     bottoms = np.vstack((np.zeros(3), np.cumsum(trans_frac, axis=0)))
     for i in range(trans_frac.shape[0]):
@@ -164,5 +175,5 @@ def plot_bar_trans_prob(trans_frac, col_name, file_name=None):
     plt.legend()
     if not file_name:
         file_name = col_name
-    plt.savefig(join(FOLDER_SIMULATOR_INPUT, '{}_num-trans_bar'.format(file_name)))
+    plt.savefig(join(make_folder(FOLDER_SIMULATOR_INPUT), '{}_num-trans_bar'.format(file_name)))
     plt.close()
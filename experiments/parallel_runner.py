@@ -0,0 +1,203 @@
+"""
+Runs a grid of independent simulations (parameters x authenticator x seed) in a pool of processes.
+
+Every finished run is saved to the results folder (rewards per timestep, and optionally the transaction log),
+so that after a crash the same grid can be started again and only the missing runs are simulated.
+The result files are named after the run and a hash of its parameters, so runs with changed parameters
+are simulated again instead of reusing the results of the old parameters.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from os import makedirs, replace
+from os.path import join, exists, isdir
+import hashlib
+import numpy as np
+import pandas as pd
+from authenticators.simple_authenticators import RandomAuthenticator, \
+    HeuristicAuthenticator, OracleAuthenticator, NeverSecondAuthenticator, \
+    AlwaysSecondAuthenticator
+from experiments import rewards
+from simulator import parameters
+from simulator import checkpoint
+from simulator.transaction_model import TransactionModel
+
+
+# one simulation run; the authenticator factory is called (without arguments) in the worker process,
+# so it has to be picklable, e.g. an authenticator class or a functools.partial of one
+ExperimentRun = namedtuple('ExperimentRun', ['name', 'params', 'authenticator_factory', 'seed'])
+
+
+def make_grid(param_sets, authenticator_factories, seeds):
+    """
+    :param param_sets:                  dict from label to simulation parameters (the seed is set per run)
+    :param authenticator_factories:     dict from authenticator name to authenticator factory
+    :param seeds:                       list of seeds
+    :return:                            list of ExperimentRuns, one per (parameters, authenticator, seed),
+                                        named '<parameters label>_<authenticator name>'
+    """
+    return [ExperimentRun('{}_{}'.format(label, name), params, factory, seed)
+            for label, params in param_sets.items()
+            for name, factory in authenticator_factories.items() for seed in seeds]
+
+
+def update_params_hash(sha, value):
+    if isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            sha.update(repr(key).encode())
+            update_params_hash(sha, value[key])
+    elif isinstance(value, (list, tuple)):
+        sha.update('{}:{}'.format(type(value).__name__, len(value)).encode())
+        for item in value:
+            update_params_hash(sha, item)
+    elif isinstance(value, pd.DataFrame):
+        sha.update(repr((value.columns.tolist(), value.dtypes.astype(str).tolist())).encode())
+        sha.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        sha.update(repr((value.dtype.str, value.shape)).encode())
+        sha.update(np.ascontiguousarray(value).tobytes())
+    else:
+        sha.update(repr(value).encode())
+
+
+def get_params_hash(params):
+    """
+    :return:    a hash of the simulation parameters (without the seed, which is set per run) that is stable
+                across processes, so it can be used in the names of result files
+    """
+    sha = hashlib.sha1()
+    update_params_hash(sha, {key: value for key, value in params.items() if key != 'seed'})
+    return sha.hexdigest()[:12]
+
+
+def get_rewards_path(results_folder, run):
+    return join(results_folder, '{}_{}_{}_rewards.npz'.format(run.name, get_params_hash(run.params), run.seed))
+
+
+def get_transaction_log_path(results_folder, run):
+    return join(results_folder, '{}_{}_{}_transaction_log.csv'.format(run.name, get_params_hash(run.params), run.seed))
+
+
+def run_single(run, results_folder, save_logs=False):
+    """
+    Simulate one run until termination, and save its rewards per timestep (and transaction log)
+    :return:    the path of the saved rewards
+    """
+    params = dict(run.params)
+    params['seed'] = run.seed
+
+    model = TransactionModel(params, authenticator=run.authenticator_factory())
+    while not model.terminated:
+        model.step()
+
+    agent_vars = model.log_collector.get_agent_vars_dataframe()
+    model_vars = model.log_collector.get_model_vars_dataframe()
+
+    if save_logs and agent_vars is not None:
+        path_log = get_transaction_log_path(results_folder, run)
+        agent_vars.to_csv(path_log + '.tmp')
+        replace(path_log + '.tmp', path_log)
+
+    if agent_vars is not None:
+        agent_vars.index = agent_vars.index.droplevel(1)
+    run_rewards = {'monetary': rewards.monetary_reward_per_timestep(agent_vars),
+                   'money_made': rewards.money_made_per_timestep(agent_vars),
+                   'money_lost': rewards.money_lost_per_timestep(agent_vars),
+                   'satisfaction': rewards.satisfaction_per_timestep(model_vars)} if agent_vars is not None else {}
+
+    # the rewards are written last (and renamed when complete), so they mark the run as finished
+    path_rewards = get_rewards_path(results_folder, run)
+    with open(path_rewards + '.tmp', 'wb') as f:
+        np.savez(f, **run_rewards)
+    replace(path_rewards + '.tmp', path_rewards)
+
+    return path_rewards
+
+
+def run_experiments(runs, results_folder, num_workers=None, save_logs=False):
+    """
+    Run all given experiments in a pool of processes, skipping the ones that already finished
+    :param runs:            list of ExperimentRuns (see make_grid)
+    :param results_folder:  folder in which the results of every run are saved
+    :param num_workers:     number of processes (default: number of CPUs); with 1, the runs are done in this process
+    :param save_logs:       whether to also save the transaction log of every run
+    :return:                dict from (name, seed) to the rewards of the run (dict from reward type to array)
+    """
+    if not isdir(results_folder):
+        makedirs(results_folder)
+
+    todo = [run for run in runs if not exists(get_rewards_path(results_folder, run))]
+    print('{} of {} runs already finished'.format(len(runs) - len(todo), len(runs)))
+
+    if num_workers == 1:
+        for run in todo:
+            run_single(run, results_folder, save_logs)
+            print('finished', run.name, run.seed)
+    elif len(todo) > 0:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {executor.submit(run_single, run, results_folder, save_logs): run for run in todo}
+            for future in as_completed(futures):
+                # re-raises the exception of a failed run; the finished runs are saved already
+                future.result()
+                print('finished', futures[future].name, futures[future].seed)
+
+    return {(run.name, run.seed): load_rewards(results_folder, run) for run in runs}
+
+
+def load_rewards(results_folder, run):
+    """
+    :return:    the saved rewards of a finished run, as dict from reward type to array
+    """
+    with np.load(get_rewards_path(results_folder, run)) as saved_rewards:
+        return dict(saved_rewards)
+
+
+def continue_fork(snapshot, authenticator_factory):
+    """
+    Continue a model from a snapshot with a new authenticator, until termination
+    :return:    the transaction log and the model variables (satisfaction) of the whole run
+    """
+    model = checkpoint.loads_checkpoint(snapshot)
+    model.authenticator = authenticator_factory()
+    model.set_checkpoints(None, None)
+    while not model.terminated:
+        model.step()
+    return model.log_collector.get_agent_vars_dataframe(), model.log_collector.get_model_vars_dataframe()
+
+
+def run_forks(model, authenticator_factories, num_workers=None):
+    """
+    Fork a model in its current state (e.g. after a warm-up with model.run_until) into one copy per
+    authenticator, and continue all copies in parallel. All copies start from the same state, including
+    the random states, so the authenticators are compared under common random numbers.
+    :param model:                       the model to fork (is not changed)
+    :param authenticator_factories:     dict from authenticator name to picklable authenticator factory
+    :param num_workers:                 number of processes (default: number of CPUs)
+    :return:                            dict from authenticator name to (agent_vars, model_vars) of the fork
+    """
+    snapshot = checkpoint.dumps_checkpoint(model)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {name: executor.submit(continue_fork, snapshot, factory)
+                   for name, factory in authenticator_factories.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+if __name__ == '__main__':
+
+    # the same parameters and authenticators as in run_multimaus, for 5 seeds each
+    params = parameters.get_default_parameters()
+    params['init_satisfaction'] = 0.9
+    params['stay_prob'] = [0.8, 0.5]
+    param_sets = {'multimaus': params}
+
+    authenticators = {'random': RandomAuthenticator,
+                      'oracle': OracleAuthenticator,
+                      'never_second': NeverSecondAuthenticator,
+                      'heuristic': partial(HeuristicAuthenticator, 50),
+                      'always_second': AlwaysSecondAuthenticator}
+
+    results = run_experiments(make_grid(param_sets, authenticators, seeds=range(666, 671)), join('results', 'grid'))
+
+    for name in authenticators:
+        monetary = [results[('multimaus_' + name, seed)]['monetary'] for seed in range(666, 671)]
+        print(name, 'mean total monetary reward:', np.mean([np.sum(m) for m in monetary]))
@@ -5,11 +5,15 @@ from simulator import parameters
 from simulator.transaction_model import TransactionModel
 from experiments import rewards
 import numpy as np
-import matplotlib.pyplot as plt
 from experiments import result_handling
+from experiments import parallel_runner
+from functools import partial
+from datetime import datetime
+from pytz import timezone
 
 
 def run_single():
+    import matplotlib.pyplot as plt
 
     # get the parameters for the simulation
     params = parameters.get_default_parameters()
@@ -68,6 +72,36 @@ def run_single():
     plt.show()
 
 
+def run_forked(warm_up_until=datetime(2016, 2, 1).replace(tzinfo=timezone('US/Pacific'))):
+    """
+    Simulate a warm-up period (without second authentication) once, and then continue
+    the simulation with every authenticator in parallel, from the same state.
+    """
+    import matplotlib.pyplot as plt
+
+    params = parameters.get_default_parameters()
+    params['init_satisfaction'] = 0.9
+    params['stay_prob'] = [0.8, 0.5]
+
+    model = TransactionModel(params, NeverSecondAuthenticator())
+    model.run_until(warm_up_until)
+
+    auth_types = ['random', 'oracle', 'never_second', 'heuristic', 'always_second']
+    results = parallel_runner.run_forks(model, {a: partial(get_authenticator, a) for a in auth_types})
+
+    plt.figure(figsize=(10, 5))
+    for a in auth_types:
+        agent_vars, _ = results[a]
+        agent_vars.index = agent_vars.index.droplevel(1)
+        monetary_rewards = rewards.monetary_reward_per_timestep(agent_vars)
+        plt.ylabel('revenue (total)')
+        plt.plot(range(len(monetary_rewards)), np.cumsum(monetary_rewards), label=a)
+        plt.legend()
+
+    plt.tight_layout()
+    plt.show()
+
+
 def get_authenticator(auth_type):
     if auth_type == 'random':
         return RandomAuthenticator()
@@ -13,6 +13,7 @@ from data.features.aggregate_features import AggregateFeatures
 from data.features.apate_graph_features import ApateGraphFeatures
 from mesa.time import BaseScheduler
 from simulator import parameters
+from simulator import checkpoint
 from simulator.transaction_model import TransactionModel
 
 
@@ -66,11 +67,6 @@ class OnlineUnimaus:
         Blocks the given list of Card IDs (removing all genuine and fraudulent customers with matching
         Card IDs from the simulation).
 
-        NOTE: This function is only intended to be called using Card IDs that are 100% known to have
-        been involved in fraudulent transactions. If the list contains more than a single Card ID,
-        and the Card ID has not been used in any fraudulent transactions, the function may not be able
-        to find the matching customer (due to an optimization in the implementation)
-
         :param card_ids:
             List of one or more Card IDs to block
         :param replace_fraudsters:
@@ -94,57 +90,47 @@ class OnlineUnimaus:
 
         num_banned_fraudsters = 0
 
-        if n == 1:
-            # most efficient implementation in this case is simply to loop once through all customers (fraudulent
-            # as well as genuine) and compare to our single blocked card ID
-            blocked_card_id = card_ids[0]
-
-            for customer in self.model.customers:
-                if customer.card_id == blocked_card_id:
-                    customer.stay = False
+        # the model keeps an index from card IDs to customers/fraudsters, so we don't have to loop through them;
+        # blocked customers/fraudsters are removed right away, so fraudsters can't steal a blocked card anymore
+        for blocked_card_id in card_ids:
+            customer = self.model.get_customer_by_card(blocked_card_id)
+            if customer is not None:
+                self.model.remove_now(customer)
 
-                    # should not be any more customers with same card ID, so can break
-                    break
+            # removing a fraudster changes the list of fraudsters with this card, so we loop over a copy
+            for fraudster in list(self.model.get_fraudsters_by_card(blocked_card_id)):
+                self.model.remove_now(fraudster)
+                num_banned_fraudsters += 1
 
-            for fraudster in self.model.fraudsters:
-                if fraudster.card_id == blocked_card_id:
-                    fraudster.stay = False
-                    num_banned_fraudsters += 1
-
-                    # should not be any more fraudsters with same card ID, so can break
-                    break
-        else:
-            # with naive implementation, we'd have n loops through the entire list of customers, which may be expensive
-            # instead, we loop through it once to collect only those customers with corrupted cards. Then, we follow
-            # up with n loops through that much smaller list of customers with corrupted cards
-            compromised_customers = [c for c in self.model.customers if c.card_corrupted]
-
-            for blocked_card_id in card_ids:
-                for customer in compromised_customers:
-                    if customer.card_id == blocked_card_id:
-                        customer.stay = False
+        if replace_fraudsters:
+            self.model.add_fraudsters(num_banned_fraudsters)
 
-                        # should not be any more customers with same card ID, so can break
-                        break
+    def save_checkpoint(self, path):
+        """
+        Saves the state of the online simulator (including the model and the feature constructors) to a file
 
-                for fraudster in self.model.fraudsters:
-                    if fraudster.card_id == blocked_card_id:
-                        fraudster.stay = False
-                        num_banned_fraudsters += 1
+        :param path:
+            The file to write to
+        """
+        checkpoint.save_checkpoint(self, path)
 
-                        # should not be any more fraudsters with same card ID, so can break
-                        break
+    @staticmethod
+    def load_checkpoint(path):
+        """
+        Loads an online simulator saved with save_checkpoint(). Stepping it continues exactly where it was saved.
 
-        if replace_fraudsters:
-            self.model.add_fraudsters(num_banned_fraudsters)
+        :param path:
+            The file to read from
+        :return:
+            The OnlineUnimaus object
+        """
+        return checkpoint.load_checkpoint(path)
 
     def clear_log(self):
         """
         Clears all transactions generated so far from memory
         """
-        agent_vars = self.model.log_collector.agent_vars
-        for reporter_name in agent_vars:
-            agent_vars[reporter_name] = []
+        self.model.log_collector.clear_agent_vars()
 
     def get_log(self, clear_after=True):
         """
@@ -1,5 +1,6 @@
 from simulator import parameters
 from simulator.transaction_model import TransactionModel
+from simulator.observers import ProgressReporter
 import time
 from experiments import result_handling
 
@@ -11,6 +12,7 @@ def run_single():
     # initialise the model with some parameters
     params = parameters.get_default_parameters().copy()
     model = TransactionModel(params)
+    model.add_observer(ProgressReporter(every='month'))
 
     # run the simulation until termination
     while not model.terminated:
@@ -2,10 +2,12 @@
 Wrapper for an environment
 """
 import state_space
+from authenticators.abstract_authenticator import AbstractAuthenticator
 
 
-class Environment:
+class Environment(AbstractAuthenticator):
     def __init__(self, agent):
+        super().__init__()
 
         # the RL agent we use to ask for authentications
         self.agent = agent
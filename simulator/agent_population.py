@@ -0,0 +1,70 @@
+class AgentPopulation:
+    """
+    List-like container of agents that supports adding and removing single agents in O(1),
+    by keeping the position of every agent and moving the last agent into the gap of a removed one.
+    It can be used as the agent list of a mesa scheduler (which shuffles it in place),
+    and optionally keeps a running total of the satisfaction of its agents.
+    """
+    def __init__(self, agents=(), track_satisfaction=False):
+        """
+        :param agents:              initial agents
+        :param track_satisfaction:  whether to keep the total satisfaction of the agents
+        """
+        self.agents = []
+        self.position = dict()
+        self.track_satisfaction = track_satisfaction
+        self.total_satisfaction = 0.
+        self.extend(agents)
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __iter__(self):
+        return iter(self.agents)
+
+    def __contains__(self, agent):
+        return agent in self.position
+
+    def __getitem__(self, idx):
+        return self.agents[idx]
+
+    def __setitem__(self, idx, agent):
+        # used when the scheduler shuffles the agents; the agent is already in the population
+        self.agents[idx] = agent
+        self.position[agent] = idx
+
+    def append(self, agent):
+        self.position[agent] = len(self.agents)
+        self.agents.append(agent)
+        if self.track_satisfaction:
+            self.total_satisfaction += agent.satisfaction
+
+    def extend(self, agents):
+        for agent in agents:
+            self.append(agent)
+
+    def remove(self, agent):
+        """
+        Remove an agent from the population (if it is in there)
+        :param agent:   the agent to remove
+        """
+        pos = self.position.pop(agent, None)
+        if pos is None:
+            return
+        last = self.agents.pop()
+        if pos < len(self.agents):
+            self.agents[pos] = last
+            self.position[last] = pos
+        if self.track_satisfaction:
+            self.total_satisfaction -= agent.satisfaction
+
+    def update_satisfaction(self, old_satisfaction, new_satisfaction):
+        """
+        Has to be called whenever the satisfaction of an agent in the population changes
+        """
+        self.total_satisfaction += new_satisfaction - old_satisfaction
+
+    def get_mean_satisfaction(self):
+        if len(self.agents) == 0:
+            return float('nan')
+        return self.total_satisfaction / len(self.agents)
@@ -0,0 +1,47 @@
+from os import replace
+import pickle
+import random
+
+
+def dumps_checkpoint(obj):
+    """
+    Binary snapshot of a simulation (e.g. a TransactionModel).
+    Besides the object itself, this stores the state of python's global random generator,
+    which the mesa schedulers use to shuffle the agents, so a resumed run continues exactly.
+    :param obj:     the object to save (has to be picklable)
+    :return:        bytes
+    """
+    return pickle.dumps({'object': obj, 'python_random_state': random.getstate()}, pickle.HIGHEST_PROTOCOL)
+
+
+def loads_checkpoint(data):
+    """
+    Load a snapshot made by dumps_checkpoint (this also restores python's global random generator)
+    :param data:    bytes
+    :return:        the saved object
+    """
+    checkpoint = pickle.loads(data)
+    random.setstate(checkpoint['python_random_state'])
+    return checkpoint['object']
+
+
+def save_checkpoint(obj, path):
+    """
+    Write a snapshot of a simulation to disk (see dumps_checkpoint).
+    The snapshot is written to a temporary file first, so a crash while saving keeps the old one.
+    :param obj:     the object to save (has to be picklable)
+    :param path:    the file to write to
+    """
+    with open(path + '.tmp', 'wb') as f:
+        f.write(dumps_checkpoint(obj))
+    replace(path + '.tmp', path)
+
+
+def load_checkpoint(path):
+    """
+    Load a snapshot written by save_checkpoint
+    :param path:    the file to read from
+    :return:        the saved object
+    """
+    with open(path, 'rb') as f:
+        return loads_checkpoint(f.read())
@@ -1,9 +1,14 @@
-from mesa import Agent
 from abc import ABCMeta, abstractmethod
-import numpy as np
 
 
-class AbstractCustomer(Agent,  metaclass=ABCMeta):
+class AbstractCustomer(metaclass=ABCMeta):
+    # all attributes are slots, so customers don't need a __dict__; that's also why this doesn't inherit from
+    # mesa's Agent (which has no __slots__), but has the same interface (unique_id, model and step)
+    __slots__ = ('unique_id', 'model', 'params', 'random_state', 'fraudster', 'country_code', 'currency_code',
+                 'card_id',
+                 'active', 'curr_merchant', 'curr_amount', 'curr_auth_step', 'curr_trans_cancelled',
+                 'curr_trans_success', 'stay')
+
     def __init__(self, unique_id, transaction_model, fraudster):
         """
         Abstract class for customers, which can either be genuine or fraudulent.
@@ -11,21 +16,22 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
         :param transaction_model:   the transaction model that is used, instance of mesa.Model
         :param fraudster:           boolean whether customer is genuine or fraudulent
         """
-        # call super init from mesa agent
-        super().__init__(unique_id, transaction_model)
+        self.unique_id = unique_id
+        self.model = transaction_model
 
         # copy parameters from model
         self.params = self.model.parameters
 
-        # internal random state (different for every customer0
-        self.random_state = np.random.RandomState(self.model.random_state.randint(0, np.iinfo(np.int32).max))
-
         # each customer has to say if it's a fraudster or not
         self.fraudster = int(fraudster)
 
-        # pick country, currency, card
-        self.country = self.initialise_country()
-        self.currency = self.initialise_currency()
+        # internal random stream (different for every customer, derived from the seed and the ID)
+        kind = self.model.random_streams.FRAUDSTER if self.fraudster else self.model.random_streams.CUSTOMER
+        self.random_state = self.model.random_streams.get_stream(kind, self.unique_id)
+
+        # pick country, currency (as integer codes, see TransactionModel.initialise_category_codes), card
+        self.country_code = self.initialise_country()
+        self.currency_code = self.initialise_currency()
         self.card_id = None  # picked with first transaction
 
         # variable for whether a transaction is currently being processed
@@ -34,7 +40,6 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
         # fields for storing the current transaction properties
         self.curr_merchant = None
         self.curr_amount = None
-        self.local_datetime = None
         self.curr_auth_step = 0
         self.curr_trans_cancelled = False
         self.curr_trans_success = False
@@ -56,6 +61,7 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
             # if this is the first transaction, we assign a card ID
             if self.card_id is None:
                 self.card_id = self.initialise_card_id()
+                self.model.register_card(self)
 
             # set the agent to active
             self.active = True
@@ -66,11 +72,8 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
             # pick a current amount
             self.curr_amount = self.get_curr_amount()
 
-            # process current transaction
-            self.curr_trans_success = self.model.process_transaction(self)
-
-            # if necessary post-process the transaction
-            self.post_process_transaction()
+            # the model authorises all transactions of this step in a batch, and completes them afterwards
+            self.model.pending_transactions.append(self)
 
         else:
 
@@ -78,7 +81,53 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
             self.active = False
             self.curr_merchant = None
             self.curr_amount = None
-            self.local_datetime = None
+
+            # if the customer decided to leave, the model removes it in the next migration
+            if not self.stay:
+                self.model.leave(self)
+
+    def complete_transaction(self, success):
+        """
+        Called once the current transaction got authorised (or cancelled)
+        :param success:     whether the transaction was successful
+        """
+        self.curr_trans_success = success
+
+        # if necessary post-process the transaction
+        self.post_process_transaction()
+
+        # if the customer decided to leave, the model removes it in the next migration
+        if not self.stay:
+            self.model.leave(self)
+
+    @property
+    def country(self):
+        return self.model.country_labels[self.country_code]
+
+    @property
+    def currency(self):
+        return self.model.currency_labels[self.currency_code]
+
+    @property
+    def local_datetime(self):
+        """
+        The naive local date of the current transaction (None if there is no transaction)
+        """
+        return self.get_local_datetime() if self.active else None
+
+    @abstractmethod
+    def get_local_datetime(self):
+        """
+        :return:    the current naive local date of the customer
+        """
+        pass
+
+    @abstractmethod
+    def get_local_epoch_second(self):
+        """
+        :return:    the current naive local date of the customer, as seconds since the epoch (for the logs)
+        """
+        pass
 
     def request_transaction(self):
         self.model.authorise_transaction(self)
@@ -121,7 +170,7 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
     def initialise_country(self):
         """
         Select country where customer's card was issued
-        :return:    country
+        :return:    country code
         """
         pass
 
@@ -129,7 +178,7 @@ class AbstractCustomer(Agent,  metaclass=ABCMeta):
     def initialise_currency(self):
         """
         Select currency in which customer makes transactions
-        :return:    string
+        :return:    currency code
         """
         pass
 
@@ -1,9 +1,11 @@
 import numpy as np
-from pytz import timezone, country_timezones
 from simulator.customer_abstract import AbstractCustomer
 
 
 class BaseCustomer(AbstractCustomer):
+    __slots__ = ('noise_level', 'avg_trans_per_hour', 'profile_row', 'day_intensity', 'intensity_day',
+                 'max_transaction_prob', 'transaction_prob_bound')
+
     def __init__(self, transaction_model, fraudster):
         """
         Base class for customers/fraudsters that support uni-modal authentication.
@@ -20,17 +22,48 @@ class BaseCustomer(AbstractCustomer):
         # average number of transaction per hour in general; varies per customer
         self.avg_trans_per_hour = self.initialise_avg_trans_per_hour()
 
-        # initialise transaction probabilities per month/monthday/weekday/hour
-        self.trans_prob_month, self.trans_prob_monthday, self.trans_prob_weekday, self.trans_prob_hour = self.initialise_transaction_probabilities()
+        # initialise transaction probabilities per month/monthday/weekday/hour,
+        # which are stored in a row of the profile block that is shared by all customers/fraudsters
+        profiles = self.initialise_transaction_probabilities()
+        self.profile_row = self.model.profiles.add(*profiles)
+
+        # the cached part of the transaction probability that only changes per (local) day
+        self.day_intensity = None
+        self.intensity_day = None
+
+        # upper bound on the transaction probability over all local times (without satisfaction);
+        # a NextTransactionScheduler only wakes the customer up at candidate hours drawn with this probability
+        # and sets transaction_prob_bound, so the customer accepts a candidate with probability prob/bound
+        trans_prob_month, trans_prob_monthday, trans_prob_weekday, trans_prob_hour = profiles
+        self.max_transaction_prob = float(self.avg_trans_per_hour * 12 * np.max(trans_prob_month) *
+                                          30.5 * np.max(trans_prob_monthday) * 7 * np.max(trans_prob_weekday) *
+                                          24 * np.max(trans_prob_hour))
+        self.transaction_prob_bound = 1.
 
         # whether the current transaction was cancelled by the customer
         self.curr_trans_cancelled = False
 
+    @property
+    def trans_prob_month(self):
+        return self.model.profiles.get(self.profile_row, 'month')
+
+    @property
+    def trans_prob_monthday(self):
+        return self.model.profiles.get(self.profile_row, 'monthday')
+
+    @property
+    def trans_prob_weekday(self):
+        return self.model.profiles.get(self.profile_row, 'weekday')
+
+    @property
+    def trans_prob_hour(self):
+        return self.model.profiles.get(self.profile_row, 'hour')
+
     def decide_making_transaction(self):
         # reset that the current transaction was not cancelled
         self.curr_trans_cancelled = False
         if self.stay:
-            make_transaction = self.get_transaction_prob() > self.random_state.uniform(0, 1)
+            make_transaction = self.get_transaction_prob() > self.random_state.uniform(0, self.transaction_prob_bound)
         else:
             make_transaction = False
         return make_transaction
@@ -41,35 +74,62 @@ class BaseCustomer(AbstractCustomer):
 
     def get_transaction_prob(self):
 
-        # get the current local time
-        self.local_datetime = self.get_local_datetime()
+        calendar = self.model.local_calendar
+        global_hour = self.model.curr_global_hour
+        country_idx = self.get_country_idx()
+
+        # the transaction probability per month/monthday/weekday only changes when the local day changes,
+        # so we only multiply those once per day, and once per hour by the probability per hour
+        local_day = calendar.get_local_day(country_idx, global_hour)
+        if local_day != self.intensity_day:
+            self.day_intensity = self.get_day_intensity(country_idx)
+            self.intensity_day = local_day
+
+        local_hour = calendar.get_local_hour(country_idx, global_hour)
+        return self.day_intensity * 24 * self.model.profiles.item(self.profile_row, 'hour', local_hour)
+
+    def get_max_transaction_prob(self):
+        return self.max_transaction_prob
+
+    def get_day_intensity(self, country_idx):
+        """
+        Average number of transactions per hour, weighed by the transaction probabilities
+        for the current local month, day in month and weekday.
+        :param country_idx:     index of the country in the local calendar
+        :return:
+        """
+        month, day, weekday, _ = self.model.local_calendar.get_local_time(country_idx, self.model.curr_global_hour)
 
         # get the average transactions per hour
         trans_prob = self.avg_trans_per_hour
 
         # now weigh by probabilities of transactions per month/week/...
-        trans_prob *= 12 * self.trans_prob_month[self.local_datetime.month - 1]
-        trans_prob *= 24 * self.trans_prob_hour[self.local_datetime.hour]
-        trans_prob *= 30.5 * self.trans_prob_monthday[self.local_datetime.day - 1]
-        trans_prob *= 7 * self.trans_prob_weekday[self.local_datetime.weekday()]
+        profiles = self.model.profiles
+        trans_prob *= 12 * profiles.item(self.profile_row, 'month', month)
+        trans_prob *= 30.5 * profiles.item(self.profile_row, 'monthday', day)
+        trans_prob *= 7 * profiles.item(self.profile_row, 'weekday', weekday)
 
-        return trans_prob
+        return float(trans_prob)
 
     def get_local_datetime(self):
-        # convert global to local date (first add global timezone info, then convert to local)
-        local_datetime = self.model.curr_global_date
-        local_datetime = local_datetime.astimezone(timezone(country_timezones(self.country)[0]))
-        return local_datetime
+        # look up the (naive) local date in the calendar of the model, instead of converting the global date
+        return self.model.local_calendar.get_local_datetime(self.get_country_idx(), self.model.curr_global_hour)
+
+    def get_local_epoch_second(self):
+        return self.model.local_calendar.get_local_epoch_second(self.get_country_idx(), self.model.curr_global_hour)
+
+    def get_country_idx(self):
+        # the country codes are the indices of the countries in the local calendar
+        return self.country_code
 
     def get_curr_merchant(self):
         """
         Can be called at each transaction; will select a merchant to buy from.
         :return:    merchant ID
         """
-        merchant_prob = self.params['merchant_per_currency'][self.fraudster]
-        merchant_prob = merchant_prob.loc[self.currency]
-        merchant_ID = self.random_state.choice(merchant_prob.index.values, p=merchant_prob.values.flatten())
-        return next(m for m in self.model.merchants if m.unique_id == merchant_ID)
+        merchant_ids, cum_prob = self.model.merchant_tables[self.fraudster][self.currency_code]
+        merchant_ID = merchant_ids[np.searchsorted(cum_prob, self.random_state.uniform(0, 1), side='right')]
+        return self.model.merchants_by_id[merchant_ID]
 
     def get_curr_amount(self):
         return self.curr_merchant.get_amount(self)
@@ -81,36 +141,38 @@ class BaseCustomer(AbstractCustomer):
         return self.params['stay_prob'][self.fraudster]
 
     def initialise_country(self):
-        country_frac = self.params['country_frac']
-        return self.random_state.choice(country_frac.index.values, p=country_frac.iloc[:, self.fraudster].values)
+        cum_prob = self.model.country_tables[self.fraudster]
+        return int(np.searchsorted(cum_prob, self.random_state.uniform(0, 1), side='right'))
 
     def initialise_currency(self):
-        currency_prob = self.params['currency_per_country'][self.fraudster]
-        currency_prob = currency_prob.loc[self.country]
-        return self.random_state.choice(currency_prob.index.values, p=currency_prob.values.flatten())
+        codes, cum_prob = self.model.currency_tables[self.fraudster][self.country_code]
+        return int(codes[np.searchsorted(cum_prob, self.random_state.uniform(0, 1), side='right')])
 
     def initialise_card_id(self):
         return self.model.get_next_card_id()
 
     def initialise_transaction_probabilities(self):
+        # the noise is independent per entry, so we draw it with one normal per entry
+        # (same distribution as a multivariate normal with diagonal covariance, but much cheaper)
+
         # transaction probability per month
         trans_prob_month = self.params['frac_month'][:, self.fraudster]
-        trans_prob_month = self.random_state.multivariate_normal(trans_prob_month, np.eye(12) * self.noise_level / 1200)
+        trans_prob_month = self.random_state.normal(trans_prob_month, np.sqrt(self.noise_level / 1200))
         trans_prob_month[trans_prob_month < 0] = 0
 
         # transaction probability per day in month
         trans_prob_monthday = self.params['frac_monthday'][:, self.fraudster]
-        trans_prob_monthday = self.random_state.multivariate_normal(trans_prob_monthday, np.eye(31) * self.noise_level / 305)
+        trans_prob_monthday = self.random_state.normal(trans_prob_monthday, np.sqrt(self.noise_level / 305))
         trans_prob_monthday[trans_prob_monthday < 0] = 0
 
         # transaction probability per weekday (we assume this differs per individual)
         trans_prob_weekday = self.params['frac_weekday'][:, self.fraudster]
-        trans_prob_weekday = self.random_state.multivariate_normal(trans_prob_weekday, np.eye(7) * self.noise_level / 70)
+        trans_prob_weekday = self.random_state.normal(trans_prob_weekday, np.sqrt(self.noise_level / 70))
         trans_prob_weekday[trans_prob_weekday < 0] = 0
 
         # transaction probability per hour (we assume this differs per individual)
         trans_prob_hour = self.params['frac_hour'][:, self.fraudster]
-        trans_prob_hour = self.random_state.multivariate_normal(trans_prob_hour, np.eye(24) * self.noise_level / 240)
+        trans_prob_hour = self.random_state.normal(trans_prob_hour, np.sqrt(self.noise_level / 240))
         trans_prob_hour[trans_prob_hour < 0] = 0
 
         return trans_prob_month, trans_prob_monthday, trans_prob_weekday, trans_prob_hour
@@ -126,6 +188,8 @@ class BaseCustomer(AbstractCustomer):
 
 
 class GenuineCustomer(BaseCustomer):
+    __slots__ = ('card_corrupted', 'patience', 'satisfaction')
+
     def __init__(self, transaction_model, satisfaction=1):
 
         super().__init__(transaction_model, fraudster=False)
@@ -152,6 +216,9 @@ class GenuineCustomer(BaseCustomer):
     def get_transaction_prob(self):
         return self.satisfaction * super().get_transaction_prob()
 
+    def get_max_transaction_prob(self):
+        return self.satisfaction * super().get_max_transaction_prob()
+
     def decide_making_transaction(self):
         """
         For a genuine customer, we add the option of leaving
@@ -180,6 +247,8 @@ class GenuineCustomer(BaseCustomer):
         Adjust the satisfaction of the user after a transaction was made.
         :return: 
         """
+        old_satisfaction = self.satisfaction
+
         # if the customer cancelled the transaction, the satisfaction goes down by 5%
         if self.curr_trans_cancelled:
             self.satisfaction *= 0.95
@@ -193,6 +262,9 @@ class GenuineCustomer(BaseCustomer):
         self.satisfaction = min([1, self.satisfaction])
         self.satisfaction = max([0, self.satisfaction])
 
+        # the model keeps the total satisfaction of all customers
+        self.model.customers.update_satisfaction(old_satisfaction, self.satisfaction)
+
     def give_authentication(self):
         """
         Authenticate self; this can be called several times per transaction.
@@ -213,6 +285,8 @@ class GenuineCustomer(BaseCustomer):
 
 
 class FraudulentCustomer(BaseCustomer):
+    __slots__ = ()
+
     def __init__(self, transaction_model):
         super().__init__(transaction_model, fraudster=True)
 
@@ -223,21 +297,16 @@ class FraudulentCustomer(BaseCustomer):
         :return: 
         """
         if self.params['fraud_cards_in_genuine'] > self.random_state.uniform(0, 1):
-            # the fraudster picks a customer...
-            # ... (1) from a familiar country
-            fraudster_countries = self.params['country_frac'].index[self.params['country_frac']['fraud'] !=0].values
-            # ... (2) from a familiar currency
-            fraudster_currencies = self.params['currency_per_country'][1].index.get_level_values(1).unique()
-            # ... (3) that has already made a transaction
-            customers_with_active_cards = [c for c in self.model.customers if c.card_id is not None]
+            # the fraudster picks a customer (1) from a familiar country (2) from a familiar currency
+            # (3) that has already made a transaction; the model keeps a pool of these customers
+            customer = self.model.victim_pool.choice(self.random_state)
             # now pick the fraud target (if there are no targets get own credit card)
-            try:
-                customer = self.random_state.choice([c for c in customers_with_active_cards if (c.country in fraudster_countries) and (c.currency in fraudster_currencies)])
+            if customer is not None:
                 # get the information from the target
                 card = customer.card_id
-                self.country = customer.country
-                self.currency = customer.currency
-            except ValueError:
+                self.country_code = customer.country_code
+                self.currency_code = customer.currency_code
+            else:
                 card = super().initialise_card_id()
         else:
             card = super().initialise_card_id()
@@ -0,0 +1,115 @@
+from mesa.time import BaseScheduler
+import heapq
+
+
+class NextTransactionScheduler(BaseScheduler):
+    """
+    Scheduler that only steps the customers/fraudsters that might make a transaction in the current hour.
+
+    For every agent, the next candidate hour is drawn from a geometric distribution with the agent's
+    maximal transaction probability per hour (an upper bound over all local times). When the candidate
+    hour comes, the agent is woken up and accepts the candidate with probability (transaction probability
+    at this hour) / (upper bound), i.e., by thinning. This gives the same distribution of transactions as
+    asking every agent every hour, but the work per hour is proportional to the number of candidates.
+
+    The transaction probability of an agent only changes when it makes a transaction (satisfaction), after
+    which it is rescheduled. Genuine customers whose card got corrupted may leave in any hour, so they are
+    woken up every hour (like with the other schedulers) until they leave.
+    """
+    def __init__(self, model=None):
+        """
+        :param model:   the transaction model (set by the model itself if None)
+        """
+        super().__init__(model)
+
+        # priority queue of (hour, counter, agent), and the current wake-up (hour, upper bound) per agent;
+        # entries in the queue that don't match the current wake-up of the agent are outdated and skipped
+        self.queue = []
+        self.wakeups = dict()
+        self.counter = 0
+
+        # the last hour that was stepped, and the agents that were woken up in that hour
+        self.last_hour = -1
+        self.woken_agents = []
+
+    def add(self, agent):
+        super().add(agent)
+        self.schedule_next(agent, self.last_hour)
+
+    def remove(self, agent):
+        super().remove(agent)
+        self.wakeups.pop(agent, None)
+
+    def reschedule(self, agent):
+        """
+        Draw a new wake-up for an agent whose transaction probability changed since it was scheduled
+        (e.g. because its card got corrupted)
+        """
+        self.schedule_next(agent, self.last_hour)
+
+    def schedule_next(self, agent, hour):
+        """
+        Schedule the next wake-up of an agent after the given hour
+        :param agent:   a customer or fraudster
+        :param hour:    the global hour after which the agent is woken up
+        """
+        if getattr(agent, 'card_corrupted', False):
+            self.wake_up(agent, hour + 1, 1.)
+            return
+
+        bound = min(1., agent.get_max_transaction_prob())
+        if bound <= 0:
+            # this agent will never make a transaction
+            self.wakeups.pop(agent, None)
+            return
+        self.wake_up(agent, hour + int(agent.random_state.geometric(bound)), bound)
+
+    def wake_up(self, agent, hour, bound=1.):
+        """
+        Wake up an agent at the given hour (replacing its current wake-up)
+        :param agent:   a customer or fraudster
+        :param hour:    global hour at which it is stepped
+        :param bound:   upper bound on its transaction probability, used for thinning
+        """
+        self.wakeups[agent] = (hour, bound)
+        heapq.heappush(self.queue, (hour, self.counter, agent))
+        self.counter += 1
+
+    def step(self):
+        hour = self.model.curr_global_hour
+
+        # the agents of the last hour are not making a transaction anymore (important for our transaction logs)
+        for agent in self.woken_agents:
+            agent.active = False
+
+        # get the agents whose wake-up is now
+        woken = []
+        while len(self.queue) > 0 and self.queue[0][0] <= hour:
+            wakeup_hour, _, agent = heapq.heappop(self.queue)
+            if agent in self.wakeups and self.wakeups[agent][0] == wakeup_hour:
+                woken.append((agent, self.wakeups.pop(agent)[1]))
+
+        # step them in random order; each decides with its probability relative to the bound
+        self.model.random_state.shuffle(woken)
+        self.woken_agents = []
+        for agent, bound in woken:
+            agent.transaction_prob_bound = bound
+            agent.step()
+            self.woken_agents.append(agent)
+
+        # transactions that are authorised in a batch have to be completed before we draw the next wake-ups,
+        # since they can change whether the agents stay and their satisfaction
+        self.model.complete_pending_transactions()
+        for agent in self.woken_agents:
+            if agent.stay:
+                self.schedule_next(agent, hour)
+
+        self.last_hour = hour
+        self.steps += 1
+        self.time += 1
+
+    def get_active_agents(self):
+        """
+        :return:    the agents that made a transaction in the current hour
+        """
+        return [agent for agent in self.woken_agents if agent.active]
@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta
+from pytz import utc, country_timezones
+import numpy as np
+import pandas as pd
+
+
+class LocalCalendar:
+    """
+    Lookup table from (country, global hour) to the local calendar of that country.
+    Global hours are counted from the start date of the simulation.
+
+    The table is built with one vectorized timezone conversion per timezone, for a block
+    of hours at a time, so customers never have to convert the global date themselves.
+    Only the current block is kept, which keeps memory bounded for long (online) simulations.
+
+    Dates that are logged are represented as (naive) seconds since the epoch, which are only
+    converted to datetimes when the log is exported (see LogCollector).
+    """
+    def __init__(self, start_date, countries, block_size=24*366):
+        """
+        :param start_date:  the (timezone-aware) start date of the simulation, i.e., global hour 0
+        :param countries:   list of country codes; their position is used as index into the table
+        :param block_size:  number of hours per block of the table
+        """
+        self.start_date_utc = start_date.astimezone(utc).replace(tzinfo=None)
+
+        # the global date is the start date (in its own timezone) plus the number of hours since the start
+        self.start_date_global = start_date.replace(tzinfo=None)
+        self.start_second_utc = self.get_epoch_second(self.start_date_utc)
+        self.start_second_global = self.get_epoch_second(self.start_date_global)
+        self.countries = list(countries)
+        self.country_idx = {c: i for i, c in enumerate(self.countries)}
+        self.timezones = [country_timezones(c)[0] for c in self.countries]
+        self.block_size = block_size
+
+        # the current block of the table (rows: countries, columns: hours)
+        self.block_start = None
+        self.month = None
+        self.day = None
+        self.weekday = None
+        self.hour = None
+        self.local_day = None
+        self.utc_offset = None
+        self.global_month = None
+
+        # the (naive) local datetimes of the most recently requested hour
+        self.local_datetimes_hour = None
+        self.local_datetimes = None
+
+    def __getstate__(self):
+        # the tables are not pickled with checkpoints of the model (they are most of its size);
+        # they are rebuilt from the start date and the countries when they are used again
+        state = self.__dict__.copy()
+        for name in ('month', 'day', 'weekday', 'hour', 'local_day', 'utc_offset', 'global_month',
+                     'block_start', 'local_datetimes_hour', 'local_datetimes'):
+            state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        # block_start is None, so get_column rebuilds the block of the next requested hour
+        self.__dict__.update(state)
+
+    @staticmethod
+    def get_epoch_second(date):
+        """
+        :param date:    naive datetime
+        :return:        number of seconds since the epoch (1970-01-01)
+        """
+        return int((date - datetime(1970, 1, 1)).total_seconds())
+
+    def get_country_idx(self, country):
+        return self.country_idx[country]
+
+    def get_column(self, global_hour):
+        """
+        Makes sure the block containing the given global hour is loaded,
+        and returns the column of this hour within the block
+        """
+        if self.block_start is None or not (0 <= global_hour - self.block_start < self.block_size):
+            self.build_block(global_hour - global_hour % self.block_size)
+        return global_hour - self.block_start
+
+    def build_block(self, block_start):
+        """
+        Compute the local calendar for all countries for the hours in [block_start, block_start + block_size)
+        :param block_start:     the first global hour of the block
+        """
+        global_hours = pd.date_range(self.start_date_utc + timedelta(hours=block_start), periods=self.block_size, freq='H', tz=utc)
+        utc_naive = global_hours.tz_localize(None)
+
+        shape = (len(self.countries), self.block_size)
+        self.month = np.zeros(shape, dtype=np.int8)
+        self.day = np.zeros(shape, dtype=np.int8)
+        self.weekday = np.zeros(shape, dtype=np.int8)
+        self.hour = np.zeros(shape, dtype=np.int8)
+        self.local_day = np.zeros(shape, dtype=np.int32)
+        self.utc_offset = np.zeros(shape, dtype=np.int32)
+
+        # many countries share a timezone, so we only convert once per timezone
+        for tz in set(self.timezones):
+            rows = [i for i, t in enumerate(self.timezones) if t == tz]
+            local_hours = global_hours.tz_convert(tz)
+            self.month[rows] = local_hours.month - 1
+            self.day[rows] = local_hours.day - 1
+            self.weekday[rows] = local_hours.weekday
+            self.hour[rows] = local_hours.hour
+            # local days since the epoch; these identify a (month, day, weekday) combination
+            self.local_day[rows] = local_hours.tz_localize(None).values.astype('datetime64[D]').astype(np.int64)
+            self.utc_offset[rows] = (local_hours.tz_localize(None) - utc_naive).total_seconds()
+
+        # the month (0-11) of the global date
+        global_dates = pd.date_range(self.start_date_global + timedelta(hours=block_start), periods=self.block_size, freq='H')
+        self.global_month = np.array(global_dates.month - 1, dtype=np.int8)
+
+        self.block_start = block_start
+
+    def get_local_time(self, country_idx, global_hour):
+        """
+        :return:    local month (0-11), day in month (0-30), weekday (0-6) and hour (0-23)
+        """
+        col = self.get_column(global_hour)
+        # item() gives python ints, which are faster to index with than numpy scalars
+        return self.month.item(country_idx, col), self.day.item(country_idx, col), self.weekday.item(country_idx, col), self.hour.item(country_idx, col)
+
+    def get_local_hour(self, country_idx, global_hour):
+        """
+        :return:    local hour (0-23)
+        """
+        col = self.get_column(global_hour)
+        return self.hour.item(country_idx, col)
+
+    def get_local_day(self, country_idx, global_hour):
+        """
+        :return:    local day, as number of days since the epoch (1970-01-01)
+        """
+        col = self.get_column(global_hour)
+        return self.local_day.item(country_idx, col)
+
+    def get_local_days(self, global_hour):
+        """
+        :return:    array (indexed by country) of local days, as number of days since the epoch
+        """
+        col = self.get_column(global_hour)
+        return self.local_day[:, col]
+
+    def get_local_times(self, global_hour):
+        """
+        :return:    arrays (indexed by country) of the local month (0-11), day in month (0-30),
+                    weekday (0-6) and hour (0-23)
+        """
+        col = self.get_column(global_hour)
+        return self.month[:, col], self.day[:, col], self.weekday[:, col], self.hour[:, col]
+
+    def get_global_month(self, global_hour):
+        """
+        :return:    the month (0-11) of the global date
+        """
+        col = self.get_column(global_hour)
+        return self.global_month.item(col)
+
+    def get_global_epoch_second(self, global_hour):
+        """
+        :return:    the (naive) global date, as seconds since the epoch
+        """
+        return self.start_second_global + 3600 * global_hour
+
+    def get_local_epoch_second(self, country_idx, global_hour):
+        """
+        :return:    the naive local date, as seconds since the epoch
+        """
+        col = self.get_column(global_hour)
+        return self.start_second_utc + 3600 * global_hour + self.utc_offset.item(country_idx, col)
+
+    def get_local_epoch_seconds(self, global_hour):
+        """
+        :return:    array (indexed by country) of naive local dates, as seconds since the epoch
+        """
+        col = self.get_column(global_hour)
+        return self.start_second_utc + 3600 * global_hour + self.utc_offset[:, col].astype(np.int64)
+
+    def get_local_datetime(self, country_idx, global_hour):
+        """
+        :return:    the naive local datetime
+        """
+        return self.get_local_datetimes(global_hour)[country_idx]
+
+    def get_local_datetimes(self, global_hour):
+        """
+        :return:    object array (indexed by country) of naive local datetimes
+        """
+        if self.local_datetimes_hour != global_hour:
+            col = self.get_column(global_hour)
+            utc_datetime = self.start_date_utc + timedelta(hours=global_hour)
+            self.local_datetimes = np.array([utc_datetime + timedelta(seconds=int(offset)) for offset in self.utc_offset[:, col]], dtype=object)
+            self.local_datetimes_hour = global_hour
+        return self.local_datetimes
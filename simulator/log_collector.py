@@ -1,13 +1,114 @@
 from mesa.datacollection import DataCollector
-from collections import defaultdict
+import numpy as np
 import pandas as pd
 
 
+# the dtypes in which the columns of the transaction logs are stored
+TRANSACTION_LOG_DTYPES = {"Global_Date": np.int64,
+                          "Local_Date": np.int64,
+                          "CardID": np.int64,
+                          "MerchantID": np.int32,
+                          "Amount": np.float64,
+                          "Currency": np.int16,
+                          "Country": np.int16,
+                          "Target": np.uint8,
+                          "AuthSteps": np.int32,
+                          "TransactionCancelled": np.bool_,
+                          "TransactionSuccessful": np.bool_}
+
+# Currency and Country are stored as integer codes, and exported as categoricals (see LogCollector.set_categories)
+
+# the columns of the transaction logs that are stored as (naive) seconds since the epoch,
+# and converted to datetimes when the log is exported
+TRANSACTION_LOG_DATETIMES = ("Global_Date", "Local_Date")
+
+
+class ColumnBuffer:
+    """
+    Typed, growable array to which values are appended in batches.
+    The capacity is doubled when it runs out, so appending is amortised O(1) per value.
+    """
+    def __init__(self, dtype=object, capacity=1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        new_size = self.size + len(values)
+        if new_size > len(self.data):
+            data = np.empty(max(new_size, 2 * len(self.data)), dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:new_size] = values
+        self.size = new_size
+
+    def get_values(self):
+        """ the values appended so far (a view, not a copy) """
+        return self.data[:self.size]
+
+    def clear(self):
+        self.size = 0
+
+
 class LogCollector(DataCollector):
     """ 
     Inherits from the DataCollector from the mesa framework,
-    and overwrites some functions for our simulator
+    and overwrites some functions for our simulator.
+
+    The agent variables are stored column-wise, in one typed ColumnBuffer per reporter,
+    so that every transaction is appended only once and exporting is a single copy.
     """
+    def __init__(self, model_reporters=None, agent_reporters=None, agent_dtypes=None, datetime_vars=()):
+        """
+        :param model_reporters:     dict from variable name to function of the model
+        :param agent_reporters:     dict from variable name to function of an agent
+        :param agent_dtypes:        dict from variable name to the dtype in which it is stored (default: object)
+        :param datetime_vars:       agent variables that are reported as seconds since the epoch,
+                                    and exported as datetimes
+        """
+        super().__init__(model_reporters=model_reporters or {})
+        self.agent_reporters = agent_reporters or {}
+        self.datetime_vars = set(datetime_vars)
+        self.categories = dict()
+        agent_dtypes = agent_dtypes or {}
+
+        # the step and agent ID of every logged transaction, and one column per agent variable
+        self.num_steps = 0
+        self.first_buffered_step = 0
+        self.steps = ColumnBuffer(np.int32)
+        self.agent_ids = ColumnBuffer(np.int64)
+        self.agent_columns = {var: ColumnBuffer(agent_dtypes.get(var, object)) for var in self.agent_reporters}
+
+        # optional sink to which the agent variables are written in chunks (see CsvLogSink)
+        self.sink = None
+
+    def __getstate__(self):
+        # the reporters are usually lambdas, which can't be pickled; the model sets them again after loading
+        state = self.__dict__.copy()
+        state['model_reporters'] = None
+        state['agent_reporters'] = None
+        return state
+
+    def set_reporters(self, model_reporters, agent_reporters):
+        self.model_reporters = model_reporters
+        self.agent_reporters = agent_reporters
+
+    def set_categories(self, categories):
+        """
+        :param categories:  dict from agent variable to the array of labels; these variables are reported
+                            as integer codes into the labels, and exported as pandas categoricals
+        """
+        self.categories = categories
+
+    def set_sink(self, sink):
+        """
+        Write the agent variables to the given sink whenever it is full, instead of keeping them all in memory.
+        get_agent_vars_dataframe then only returns the transactions that were not written yet.
+        """
+        self.sink = sink
 
     def collect(self, model):
         """ collect only logs from agents that make a transation"""
@@ -16,9 +117,46 @@ class LogCollector(DataCollector):
                 self.model_vars[var].append(reporter(model))
 
         if self.agent_reporters:
-            for var, reporter in self.agent_reporters.items():
-                agent_records = [(agent.unique_id, reporter(agent)) for agent in model.schedule.agents if agent.active]
-                self.agent_vars[var].append(agent_records)
+            active_agents = model.get_active_agents()
+            self.append_agent_records([agent.unique_id for agent in active_agents],
+                                      {var: [reporter(agent) for agent in active_agents]
+                                       for var, reporter in self.agent_reporters.items()})
+
+    def append_agent_records(self, agent_ids, values):
+        """
+        Append the records of the current step
+        :param agent_ids:   the IDs of the agents that made a transaction
+        :param values:      dict from variable name to the values (one per agent)
+        """
+        self.steps.extend(np.full(len(agent_ids), self.num_steps, dtype=np.int32))
+        self.agent_ids.extend(agent_ids)
+        for var, column in self.agent_columns.items():
+            column.extend(values[var])
+        self.num_steps += 1
+
+        if self.sink is not None and self.sink.is_full(len(self.steps), self.num_steps - self.first_buffered_step):
+            self.flush()
+
+    def flush(self):
+        """ Write the agent variables collected since the last flush to the sink (if there is one) """
+        if self.sink is None:
+            return
+        agent_vars = self.get_agent_vars_dataframe()
+        if agent_vars is not None:
+            self.sink.write(agent_vars)
+        self.clear_buffers()
+
+    def clear_agent_vars(self):
+        """ Forget all agent variables collected so far (steps are counted from 0 again) """
+        self.num_steps = 0
+        self.clear_buffers()
+
+    def clear_buffers(self):
+        self.first_buffered_step = self.num_steps
+        self.steps.clear()
+        self.agent_ids.clear()
+        for column in self.agent_columns.values():
+            column.clear()
 
     def get_agent_vars_dataframe(self):
         """ Create a pandas DataFrame from the agent variables.
@@ -34,20 +172,35 @@ class LogCollector(DataCollector):
         mesa implementation)
 
         """
-        data = defaultdict(dict)
-        found_entries = False
+        if len(self.steps) == 0:
+            return None
 
-        for var, records in self.agent_vars.items():
-            for step, entries in enumerate(records):
-                for entry in entries:
-                    agent_id = entry[0]
-                    val = entry[1]
-                    data[(step, agent_id)][var] = val
-                    found_entries = True
+        index = pd.MultiIndex.from_arrays([self.steps.get_values().copy(), self.agent_ids.get_values().copy()],
+                                          names=["Step", "AgentID"])
+        columns = list(self.agent_columns.keys())
+        data = {var: self.agent_columns[var].get_values().copy() for var in columns}
+        for var in self.datetime_vars:
+            data[var] = data[var].astype('datetime64[s]').astype('datetime64[ns]')
+        for var, labels in self.categories.items():
+            data[var] = pd.Categorical.from_codes(data[var], categories=labels)
+        return pd.DataFrame(data, index=index, columns=columns)
 
-        if not found_entries:
-            return None
 
-        df = pd.DataFrame.from_dict(data, orient="index")
-        df.index.names = ["Step", "AgentID"]
-        return df
+class TransactionBatchLogCollector(LogCollector):
+    """
+    Log collector for models that process all transactions of a step as one batch
+    (see VectorizedTransactionModel). The agent reporters get the batch of the current
+    step (a dict of arrays) and return one value per transaction, so the logs have
+    the same schema as the ones from the LogCollector.
+    """
+
+    def collect(self, model):
+        """ collect the logs of all transactions in the current batch """
+        if self.model_reporters:
+            for var, reporter in self.model_reporters.items():
+                self.model_vars[var].append(reporter(model))
+
+        if self.agent_reporters:
+            batch = model.curr_transactions
+            self.append_agent_records(batch['unique_id'],
+                                      {var: reporter(batch) for var, reporter in self.agent_reporters.items()})
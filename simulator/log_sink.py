@@ -0,0 +1,128 @@
+from os import makedirs, listdir
+from os.path import join, isdir, exists
+import json
+import numpy as np
+import pandas as pd
+
+
+class CsvLogSink:
+    """
+    Writes the transaction log to disk in chunks, as numbered CSV files in a folder,
+    so that the log collector only has to keep the transactions of the current chunk in memory.
+    A chunk is written as soon as it spans max_steps steps or holds max_rows transactions.
+    With the first chunk, the sink writes the schema of the log (the dtype of every column, and the categories
+    of categorical columns), so that iter_log_chunks reads the chunks back with the same dtypes.
+    """
+    CHUNK_PREFIX = 'transaction_log_'
+    SCHEMA_FILE = 'transaction_log_schema.json'
+
+    def __init__(self, folder, max_steps=24*7, max_rows=None):
+        """
+        :param folder:      folder to write the chunks to (created if it doesn't exist; must not contain chunks yet)
+        :param max_steps:   maximal number of steps per chunk (None for no limit)
+        :param max_rows:    maximal number of transactions per chunk (None for no limit)
+        """
+        if max_steps is None and max_rows is None:
+            raise ValueError('CsvLogSink needs at least one of max_steps and max_rows')
+
+        if not isdir(folder):
+            makedirs(folder)
+        if len(get_chunk_paths(folder)) > 0:
+            raise ValueError('folder {} already contains a transaction log'.format(folder))
+
+        self.folder = folder
+        self.max_steps = max_steps
+        self.max_rows = max_rows
+        self.next_chunk = 0
+
+    def is_full(self, num_rows, num_steps):
+        """
+        :param num_rows:    number of transactions collected since the last chunk was written
+        :param num_steps:   number of steps collected since the last chunk was written
+        :return:            whether the collected transactions should be written now
+        """
+        return (self.max_steps is not None and num_steps >= self.max_steps) or \
+               (self.max_rows is not None and num_rows >= self.max_rows)
+
+    def write(self, agent_vars):
+        """
+        Write one chunk of the transaction log
+        :param agent_vars:  DataFrame with the transactions, as returned by LogCollector.get_agent_vars_dataframe
+        """
+        if self.next_chunk == 0:
+            with open(join(self.folder, self.SCHEMA_FILE), 'w') as f:
+                json.dump(get_schema(agent_vars), f, indent=2)
+        path = join(self.folder, '{}{:06d}.csv'.format(self.CHUNK_PREFIX, self.next_chunk))
+        agent_vars.to_csv(path)
+        self.next_chunk += 1
+
+
+def get_schema(agent_vars):
+    """
+    :param agent_vars:  DataFrame with the transactions
+    :return:            dict with the names of the index levels, and per column (including the index levels)
+                        the dtype, and the categories of categorical columns
+    """
+    schema = {'index': list(agent_vars.index.names), 'columns': dict()}
+    for name, column in agent_vars.reset_index().items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            schema['columns'][name] = {'dtype': 'category', 'categories': column.cat.categories.tolist()}
+        else:
+            schema['columns'][name] = {'dtype': column.dtype.str}
+    return schema
+
+
+def read_chunk(path, schema):
+    """
+    Read a chunk with the dtypes of the schema (see get_schema)
+    :return:    DataFrame with the transactions of the chunk
+    """
+    dtypes = dict()
+    parse_dates = []
+    na_values = dict()
+    for name, column in schema['columns'].items():
+        if column['dtype'] == 'category':
+            # read the labels as they are (e.g. the country code NA of Namibia is not a missing value)
+            dtypes[name] = str
+        elif np.dtype(column['dtype']).kind == 'M':
+            parse_dates.append(name)
+        else:
+            dtypes[name] = np.dtype(column['dtype'])
+            if dtypes[name].kind == 'f':
+                na_values[name] = ['']
+    chunk = pd.read_csv(path, dtype=dtypes, parse_dates=parse_dates, keep_default_na=False, na_values=na_values,
+                        float_precision='round_trip')
+    for name, column in schema['columns'].items():
+        if column['dtype'] == 'category':
+            chunk[name] = pd.Categorical(chunk[name], categories=column['categories'])
+        elif np.dtype(column['dtype']).kind == 'M':
+            chunk[name] = chunk[name].astype(column['dtype'])
+    return chunk.set_index(schema['index'])
+
+
+def get_chunk_paths(folder):
+    """
+    :return:    the paths of the chunks of the transaction log in the given folder, in order
+    """
+    return [join(folder, f) for f in sorted(listdir(folder))
+            if f.startswith(CsvLogSink.CHUNK_PREFIX) and f.endswith('.csv')]
+
+
+def iter_log_chunks(folder):
+    """
+    Iterate over the chunks of a transaction log written by a CsvLogSink
+    :param folder:  the folder the sink wrote to
+    :return:        generator of DataFrames (indexed by Step and AgentID), one per chunk, with the same
+                    dtypes as the DataFrames returned by LogCollector.get_agent_vars_dataframe
+    """
+    schema_path = join(folder, CsvLogSink.SCHEMA_FILE)
+    schema = None
+    if exists(schema_path):
+        with open(schema_path) as f:
+            schema = json.load(f)
+    for path in get_chunk_paths(folder):
+        if schema is None:
+            # written without a schema; let pandas infer the dtypes
+            yield pd.read_csv(path, index_col=[0, 1], parse_dates=['Global_Date', 'Local_Date'], float_precision='round_trip')
+        else:
+            yield read_chunk(path, schema)
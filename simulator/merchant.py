@@ -1,22 +1,57 @@
-from mesa import Agent
 import numpy as np
 
 
-class Merchant(Agent):
+class Merchant:
     """
     A merchant that sells products to customers.
     """
+    # like customers, merchants have slots instead of a __dict__ (so they don't inherit from mesa's Agent)
+    __slots__ = ('unique_id', 'model', 'random_state', 'distr_params', 'min_amount', 'max_amount',
+                 'bin_cum_prob', 'bin_edges')
+
     def __init__(self, merchant_id, transaction_model):
-        super().__init__(merchant_id, transaction_model)
+        self.unique_id = merchant_id
+        self.model = transaction_model
 
         # the parameters to obtain transaction amounts from this merchant
-        self.random_state = np.random.RandomState(self.model.random_state.randint(0, np.iinfo(np.int32).max))
+        self.random_state = self.model.random_streams.get_stream(self.model.random_streams.MERCHANT, self.unique_id)
         self.distr_params = self.model.parameters['merchant_amount_distr'][:, self.unique_id, :]
 
         # save the min/max amount in a seperate field in case customers want to choose the amount themselves
         self.min_amount = np.min(self.distr_params)
         self.max_amount = np.max(self.distr_params)
 
+        # per fraudster: the cumulative bin probabilities and the bin edges of the amount distribution,
+        # so that we can pick a bin with one searchsorted over a uniform draw
+        self.bin_cum_prob, self.bin_edges = self.initialise_amount_tables()
+
+    def initialise_amount_tables(self):
+        """
+        Split the amount distribution parameters (bin heights followed by bin edges)
+        into cumulative bin probabilities and bin edges, per fraudster
+        :return:    two lists (genuine, fraudulent), of cumulative probabilities and of bin edges;
+                    the cumulative probabilities are None if all bin heights are zero (no amounts observed)
+        """
+        bin_cum_prob = []
+        bin_edges = []
+        for distr_params in self.distr_params:
+            num_bins = int(len(distr_params)/2)
+            cum_prob = np.cumsum(distr_params[:num_bins])
+            bin_cum_prob.append(cum_prob / cum_prob[-1] if cum_prob[-1] > 0 else None)
+            bin_edges.append(distr_params[num_bins:])
+        return bin_cum_prob, bin_edges
+
+    def get_amount_tables(self, fraudster):
+        """
+        :param fraudster:   whether the customer is genuine (0) or fraudulent (1)
+        :return:            the cumulative bin probabilities and the bin edges of the amount distribution
+        """
+        cum_prob = self.bin_cum_prob[int(fraudster)]
+        if cum_prob is None:
+            raise ValueError('merchant {} has no amount distribution for {} customers'.format(
+                self.unique_id, 'fraudulent' if fraudster else 'genuine'))
+        return cum_prob, self.bin_edges[int(fraudster)]
+
     def get_amount(self, customer):
         """
         Returns an amount for a customer that wants to buy something.
@@ -25,15 +60,25 @@ class Merchant(Agent):
                             child instance of AbstractCustomer
         :return:
         """
-        distr_params = self.distr_params[customer.fraudster]
-
-        num_bins = int(len(distr_params)/2)
-        bin_heights = distr_params[:num_bins]
-        bin_edges = distr_params[num_bins:]
+        cum_prob, bin_edges = self.get_amount_tables(customer.fraudster)
 
-        # get a random input to the sigmoid
-        bin_idx = self.random_state.choice(range(len(bin_heights)), p=bin_heights)
+        # pick a bin, and then an amount uniformly within this bin
+        bin_idx = min(int(np.searchsorted(cum_prob, self.random_state.uniform(0, 1), side='right')), len(cum_prob) - 1)
 
         amount = self.random_state.uniform(bin_edges[bin_idx], bin_edges[bin_idx+1])
 
         return amount
+
+    def get_amounts(self, fraudster, num_transactions):
+        """
+        Batched version of get_amount, for all transactions at this merchant in one step.
+        :param fraudster:           whether the customers are genuine (0) or fraudulent (1)
+        :param num_transactions:    the number of amounts to draw
+        :return:                    array with the amounts
+        """
+        cum_prob, bin_edges = self.get_amount_tables(fraudster)
+
+        bin_idx = np.searchsorted(cum_prob, self.random_state.uniform(0, 1, size=num_transactions), side='right')
+        bin_idx = np.minimum(bin_idx, len(cum_prob) - 1)
+
+        return self.random_state.uniform(bin_edges[bin_idx], bin_edges[bin_idx+1])
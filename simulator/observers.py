@@ -0,0 +1,61 @@
+from datetime import timedelta
+import sys
+import time
+
+
+class StepObserver:
+    """
+    Base class for observers of a TransactionModel (see TransactionModel.add_observer).
+    After every step, the model calls on_step with the metrics of that step.
+    """
+    def on_step(self, model, metrics):
+        """
+        :param model:       the transaction model
+        :param metrics:     dict with the 'step' (global hour) and 'date' of the step, the population size
+                            ('num_customers', 'num_fraudsters'), the 'transactions' and 'fraud_successes'
+                            of the step, the 'mean_satisfaction', and the 'steps_per_second' and 'eta_seconds'
+                            (estimated time until termination) since the model got its first observer
+        """
+        pass
+
+
+class ProgressReporter(StepObserver):
+    """
+    Writes a line with the progress of the simulation, every month (of the simulation) or every n steps,
+    and at most once every min_seconds; the last step is always reported.
+    """
+    def __init__(self, every='month', min_seconds=0., stream=None):
+        """
+        :param every:           'month' to report the first step of every month, or a number of steps
+        :param min_seconds:     minimal wall time between two reports
+        :param stream:          file to write to (sys.stdout if None)
+        """
+        self.every = every
+        self.min_seconds = min_seconds
+        self.stream = stream
+        self.last_month = None
+        self.last_report = None
+
+    def is_due(self, model, metrics):
+        if model.terminated:
+            return True
+        if self.last_report is not None and time.perf_counter() - self.last_report < self.min_seconds:
+            return False
+        if self.every == 'month':
+            return metrics['date'].month != self.last_month
+        return metrics['step'] % self.every == 0
+
+    def on_step(self, model, metrics):
+        if not self.is_due(model, metrics):
+            return
+        self.last_month = metrics['date'].month
+        self.last_report = time.perf_counter()
+
+        eta = metrics['eta_seconds']
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write('{} | customers {} | fraudsters {} | transactions {} | fraud successes {} | '
+                     'satisfaction {:.3f} | {:.1f} steps/s | ETA {}\n'.format(
+                         metrics['date'].date(), metrics['num_customers'], metrics['num_fraudsters'],
+                         metrics['transactions'], metrics['fraud_successes'], metrics['mean_satisfaction'],
+                         metrics['steps_per_second'], '-' if eta is None else timedelta(seconds=int(eta))))
+        stream.flush()
@@ -0,0 +1,221 @@
+"""
+Compiles the simulator input (data/simulator_input) into a single binary bundle, and loads it with a cache.
+
+The bundle starts with a JSON header (the format version, the hash of the input files, the numpy/pandas versions
+that wrote it, and the dtype/shape/offset of every array), followed by the raw arrays, which are memory-mapped
+when loading, so processes that load the same bundle share its pages. Tables are stored dictionary-encoded:
+the labels of every index level once (in the header), and integer codes per row.
+The header contains no pickled objects, so a bundle doesn't depend on the library versions that wrote it.
+
+The bundle is rebuilt automatically when the hash of the input files or the format version changes,
+or when it can't be read. If the input folder isn't writable, the input files are read into memory instead.
+"""
+from os import remove, replace
+from os.path import join, exists, dirname, basename
+import hashlib
+import json
+import struct
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+# the input files: (name, file, read_csv kwargs); npy files have no kwargs
+SIMULATOR_INPUT_TABLES = [('aggregated_data', 'aggregated_data.csv', {'index_col': 0}),
+                          ('country_frac', 'country_frac.csv', {'index_col': 0}),
+                          ('currency_per_country0', 'currency_per_country0.csv', {'index_col': [0, 1], 'header': None}),
+                          ('currency_per_country1', 'currency_per_country1.csv', {'index_col': [0, 1], 'header': None}),
+                          ('merchant_per_currency0', 'merchant_per_currency0.csv', {'index_col': [0, 1], 'header': None}),
+                          ('merchant_per_currency1', 'merchant_per_currency1.csv', {'index_col': [0, 1], 'header': None})]
+SIMULATOR_INPUT_ARRAYS = [('monthday_frac', 'monthday_frac.npy'),
+                          ('weekday_frac', 'weekday_frac.npy'),
+                          ('month_frac', 'month_frac.npy'),
+                          ('hour_frac', 'hour_frac.npy'),
+                          ('merchant_amount_distr', 'merchant_amount_distr.npy'),
+                          ('prob_stay', 'prob_stay.npy'),
+                          ('prob_stay_after_fraud', 'prob_stay_after_fraud.npy')]
+
+BUNDLE_FILE = 'simulator_input.bundle'
+
+# version of the layout of the bundle; bundles with another version are recompiled
+BUNDLE_FORMAT_VERSION = 2
+
+# alignment (in bytes) of the arrays in the bundle
+ALIGNMENT = 64
+
+# loaded bundles per input folder: (hash of the input files, contents)
+_cache = dict()
+
+
+def get_input_hash(input_folder):
+    """
+    :return:    hash of the names and contents of all input files
+    """
+    sha = hashlib.sha1()
+    for file in sorted([f for _, f, _ in SIMULATOR_INPUT_TABLES] + [f for _, f in SIMULATOR_INPUT_ARRAYS]):
+        sha.update(file.encode())
+        with open(join(input_folder, file), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def read_input(input_folder):
+    """
+    Read all input files (without a bundle)
+    :param input_folder:    the folder with the simulator input
+    :return:                dict from input name to array/DataFrame
+    """
+    contents = {name: np.load(join(input_folder, file)) for name, file in SIMULATOR_INPUT_ARRAYS}
+    for name, file, kwargs in SIMULATOR_INPUT_TABLES:
+        contents[name] = pd.read_csv(join(input_folder, file), **kwargs)
+    return contents
+
+
+def compile_bundle(input_folder, bundle_path=None):
+    """
+    Read all input files once and write them into a single binary bundle
+    :param input_folder:    the folder with the simulator input
+    :param bundle_path:     where to write the bundle (default: in the input folder)
+    :return:                the path of the bundle
+    """
+    if bundle_path is None:
+        bundle_path = join(input_folder, BUNDLE_FILE)
+
+    arrays = []
+    header = {'format_version': BUNDLE_FORMAT_VERSION, 'input_hash': get_input_hash(input_folder),
+              'numpy_version': np.__version__, 'pandas_version': pd.__version__, 'arrays': dict(), 'tables': dict()}
+
+    contents = read_input(input_folder)
+    for name, _ in SIMULATOR_INPUT_ARRAYS:
+        arrays.append((name, contents[name]))
+
+    for name, _, _ in SIMULATOR_INPUT_TABLES:
+        table = contents[name]
+        # dictionary-encode every level of the index
+        levels = []
+        for i in range(table.index.nlevels):
+            codes, labels = pd.factorize(table.index.get_level_values(i))
+            arrays.append(('{}.codes{}'.format(name, i), codes.astype(np.int32)))
+            levels.append(np.asarray(labels).tolist())
+        header['tables'][name] = {'levels': levels, 'names': list(table.index.names), 'columns': table.columns.tolist()}
+        if table.values.dtype == object:
+            # tables with text entries (aggregated_data) are small; they are stored in the header
+            header['tables'][name]['values'] = table.values.tolist()
+        else:
+            arrays.append(('{}.values'.format(name), np.ascontiguousarray(table.values)))
+
+    # the offsets of the arrays, relative to the end of the header
+    offset = 0
+    for name, array in arrays:
+        header['arrays'][name] = (array.dtype.str, list(array.shape), offset)
+        offset += array.nbytes + (-array.nbytes) % ALIGNMENT
+
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b' ' * ((-len(header_bytes) - 8) % ALIGNMENT)
+
+    # every process writes its own temporary file (processes can compile at the same time),
+    # which replaces the bundle in one step
+    with tempfile.NamedTemporaryFile(dir=dirname(bundle_path) or '.', prefix=basename(bundle_path) + '.',
+                                     suffix='.tmp', delete=False) as f:
+        try:
+            f.write(struct.pack('<q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays:
+                f.write(array.tobytes())
+                f.write(b'\0' * ((-array.nbytes) % ALIGNMENT))
+        except BaseException:
+            f.close()
+            remove(f.name)
+            raise
+    replace(f.name, bundle_path)
+
+    return bundle_path
+
+
+def load_header(bundle_path):
+    """
+    :return:    the header of a bundle written by compile_bundle, and the offset of its arrays in the file
+    :raise ValueError:  if the bundle can't be read or has another format version
+    """
+    with open(bundle_path, 'rb') as f:
+        try:
+            header_size = struct.unpack('<q', f.read(8))[0]
+            header = json.loads(f.read(header_size).decode())
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError('Unreadable parameter bundle {}: {}'.format(bundle_path, e))
+    if not isinstance(header, dict) or header.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError('Parameter bundle {} has another format version'.format(bundle_path))
+    return header, 8 + header_size
+
+
+def map_arrays(bundle_path, header, data_offset):
+    """
+    :return:    dict from name to array of the bundle, as copy-on-write memory maps: they share the pages of
+                the bundle with other processes until they are changed, and changes are not written to the bundle
+    """
+    arrays = dict()
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        shape = tuple(shape)
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(bundle_path, dtype=dtype, mode='c', offset=data_offset + offset, shape=shape)
+    return arrays
+
+
+def load_bundle(bundle_path):
+    """
+    Load a bundle written by compile_bundle; the arrays are (copy-on-write) memory maps of the bundle
+    :return:    the header of the bundle (with the hash of the input files it was compiled from),
+                the offset of its arrays, and a dict from input name to array/DataFrame
+    :raise ValueError:  if the bundle can't be read or has another format version
+    """
+    header, data_offset = load_header(bundle_path)
+    arrays = map_arrays(bundle_path, header, data_offset)
+
+    contents = {name: arrays[name] for name, _ in SIMULATOR_INPUT_ARRAYS}
+    for name, table in header['tables'].items():
+        index_values = [pd.Index(labels)[arrays['{}.codes{}'.format(name, i)]]
+                        for i, labels in enumerate(table['levels'])]
+        if len(index_values) == 1:
+            index = pd.Index(index_values[0], name=table['names'][0])
+        else:
+            index = pd.MultiIndex.from_arrays(index_values, names=table['names'])
+        values = np.array(table['values'], dtype=object) if 'values' in table else np.array(arrays['{}.values'.format(name)])
+        contents[name] = pd.DataFrame(values, index=index, columns=table['columns'])
+
+    return header, data_offset, contents
+
+
+def get_simulator_input(input_folder):
+    """
+    The contents of all input files, from the (in-process) cache or the bundle.
+    The bundle is (re)compiled if it doesn't exist, can't be read, or the input files changed;
+    if it can't be written (e.g. a read-only input folder), the input files are read into memory.
+    Callers get their own arrays and tables, so they can change them without affecting the cache.
+    The arrays are new copy-on-write memory maps of the bundle, so processes share the pages they don't change.
+    :param input_folder:    the folder with the simulator input
+    :return:                dict from input name (file name without extension) to array/DataFrame
+    """
+    input_hash = get_input_hash(input_folder)
+
+    if input_folder not in _cache or _cache[input_folder][0] != input_hash:
+        bundle_path = join(input_folder, BUNDLE_FILE)
+        header = None
+        if exists(bundle_path):
+            try:
+                header, data_offset, contents = load_bundle(bundle_path)
+            except (ValueError, KeyError, EOFError, OSError):
+                # corrupt, or written by another version of this module; recompile it
+                header = None
+        if header is None or header['input_hash'] != input_hash:
+            try:
+                header, data_offset, contents = load_bundle(compile_bundle(input_folder, bundle_path))
+            except OSError:
+                header, contents = None, read_input(input_folder)
+        layout = (bundle_path, header, data_offset) if header is not None else None
+        _cache[input_folder] = (input_hash, layout, contents)
+
+    _, layout, contents = _cache[input_folder]
+    arrays = map_arrays(*layout) if layout is not None else dict()
+    return {name: arrays[name] if name in arrays else value.copy() for name, value in contents.items()}
@@ -1,14 +1,16 @@
 from datetime import datetime
 from pytz import timezone
-from os.path import join
 import numpy as np
 from data import utils_data
-import pandas as pd
+from simulator import parameter_bundle
 
 
 def get_default_parameters():
 
-    aggregated_data = pd.read_csv(join(utils_data.FOLDER_SIMULATOR_INPUT, 'aggregated_data.csv'), index_col=0)
+    # the input files are read from a compiled bundle, which is cached (see simulator.parameter_bundle)
+    simulator_input = parameter_bundle.get_simulator_input(utils_data.FOLDER_SIMULATOR_INPUT)
+
+    aggregated_data = simulator_input['aggregated_data']
 
     params = {
 
@@ -41,31 +43,50 @@ def get_default_parameters():
         'trans_per_year': np.array(aggregated_data.loc['transactions'].values, dtype=np.float)[1:],
 
         # transactions per day in a month
-        'frac_monthday': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'monthday_frac.npy')),
+        'frac_monthday': simulator_input['monthday_frac'],
         # transactions per day in a week
-        'frac_weekday': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'weekday_frac.npy')),
+        'frac_weekday': simulator_input['weekday_frac'],
         # transactions per month in a year
-        'frac_month': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'month_frac.npy')),
+        'frac_month': simulator_input['month_frac'],
         # transactions hour in a day
-        'frac_hour': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'hour_frac.npy')),
+        'frac_hour': simulator_input['hour_frac'],
 
         # countries
-        'country_frac': pd.read_csv(join(utils_data.FOLDER_SIMULATOR_INPUT, 'country_frac.csv'), index_col=0),
+        'country_frac': simulator_input['country_frac'],
         # currencies per country
-        'currency_per_country': [pd.read_csv(join(utils_data.FOLDER_SIMULATOR_INPUT, 'currency_per_country0.csv'), index_col=[0, 1], header=None),
-                                 pd.read_csv(join(utils_data.FOLDER_SIMULATOR_INPUT, 'currency_per_country1.csv'), index_col=[0, 1], header=None)],
+        'currency_per_country': [simulator_input['currency_per_country0'],
+                                 simulator_input['currency_per_country1']],
 
         # merchant per currency
         'merchant_per_currency': [
-            pd.read_csv(join(utils_data.FOLDER_SIMULATOR_INPUT, 'merchant_per_currency0.csv'), index_col=[0, 1], header=None),
-            pd.read_csv(join(utils_data.FOLDER_SIMULATOR_INPUT, 'merchant_per_currency1.csv'), index_col=[0, 1], header=None)],
+            simulator_input['merchant_per_currency0'],
+            simulator_input['merchant_per_currency1']],
 
         # amount per merchant
-        'merchant_amount_distr': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'merchant_amount_distr.npy')),
+        'merchant_amount_distr': simulator_input['merchant_amount_distr'],
 
         # probability of doing another transaction
-        'stay_prob': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'prob_stay.npy')),
-        'stay_after_fraud': np.load(join(utils_data.FOLDER_SIMULATOR_INPUT, 'prob_stay_after_fraud.npy'))
+        'stay_prob': simulator_input['prob_stay'],
+        'stay_after_fraud': simulator_input['prob_stay_after_fraud']
     }
 
     return params
+
+
+def get_category_labels(params):
+    """
+    The stable integer codes of the categorical values of the simulation: a country is coded by its position
+    in the country fractions (which is also its index in the local calendar), a currency by its position in the
+    sorted list of all currencies of the input. Merchants are already coded by their (integer) merchant ID.
+    :param params:  the parameters of the simulation
+    :return:        arrays with the label per code, of the countries and of the currencies
+    """
+    country_labels = np.array(params['country_frac'].index.values, dtype=object)
+
+    currencies = set()
+    for fraudster in [0, 1]:
+        currencies.update(params['currency_per_country'][fraudster].index.get_level_values(1))
+        currencies.update(params['merchant_per_currency'][fraudster].index.get_level_values(0))
+    currency_labels = np.array(sorted(currencies), dtype=object)
+
+    return country_labels, currency_labels
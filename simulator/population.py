@@ -0,0 +1,406 @@
+import numpy as np
+
+
+class CustomerPopulation:
+    """
+    Struct-of-arrays representation of a population of customers (or fraudsters).
+    Every per-customer attribute of a BaseCustomer lives in a NumPy array, so that
+    the hourly decide/stay phases can run as batched array operations.
+    Customers are addressed by their (current) index in the population; indices change when customers leave.
+    """
+
+    # per-customer fields (name, dtype, shape of a single entry)
+    FIELDS = [('unique_id', np.int64, ()),
+              ('card_id', np.int64, ()),
+              ('country', np.int32, ()),
+              ('currency', np.int32, ()),
+              ('avg_trans_per_hour', np.float64, ()),
+              ('trans_prob_month', np.float64, (12,)),
+              ('trans_prob_monthday', np.float64, (31,)),
+              ('trans_prob_weekday', np.float64, (7,)),
+              ('trans_prob_hour', np.float64, (24,)),
+              ('day_intensity', np.float64, ()),
+              ('intensity_day', np.int32, ()),
+              ('satisfaction', np.float64, ()),
+              ('patience', np.float64, ()),
+              ('stay', np.bool_, ()),
+              ('card_corrupted', np.bool_, ()),
+              ('curr_auth_step', np.int32, ()),
+              ('curr_trans_cancelled', np.bool_, ())]
+
+    def __init__(self, transaction_model, fraudster, capacity=1024):
+        """
+        :param transaction_model:   the vectorized transaction model this population lives in
+        :param fraudster:           boolean whether the population is genuine or fraudulent
+        :param capacity:            initial number of customers the arrays can hold (they grow when needed)
+        """
+        self.model = transaction_model
+        self.params = self.model.parameters
+        self.fraudster = int(fraudster)
+        self.noise_level = self.params['noise_level']
+
+        # the fields live in backing arrays with spare capacity (doubled when full), of which the first
+        # `size` rows are in use; the attributes of the fields are views of these rows
+        self.size = 0
+        self.buffers = {name: np.zeros((capacity,) + shape, dtype=dtype) for name, dtype, shape in self.FIELDS}
+        self.update_views()
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # the views are recreated after unpickling, so that they share memory with the buffers again
+        state = self.__dict__.copy()
+        for name, _, _ in self.FIELDS:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.update_views()
+
+    def update_views(self):
+        for name, _, _ in self.FIELDS:
+            setattr(self, name, self.buffers[name][:self.size])
+
+    def reserve(self, capacity):
+        """
+        Make sure the backing arrays can hold the given number of customers, by (at least) doubling their capacity
+        :param capacity:    the number of customers
+        """
+        old_capacity = len(self.buffers['unique_id'])
+        if capacity <= old_capacity:
+            return
+        new_capacity = max(capacity, 2 * old_capacity)
+        for name, dtype, shape in self.FIELDS:
+            buffer = np.zeros((new_capacity,) + shape, dtype=dtype)
+            buffer[:self.size] = self.buffers[name][:self.size]
+            self.buffers[name] = buffer
+
+    def __getitem__(self, idx):
+        return CustomerView(self, idx)
+
+    def add(self, num_customers, satisfaction=1):
+        """
+        Adds n new customers to the population, initialised the same way as a BaseCustomer.
+        :param num_customers:   the number n of new customers
+        :param satisfaction:    the initial satisfaction of (genuine) customers
+        """
+        if num_customers <= 0:
+            return
+
+        random_state = self.model.random_state
+
+        new = dict()
+        new['unique_id'] = np.array([self.model.get_next_customer_id(self.fraudster) for _ in range(num_customers)])
+        new['card_id'] = np.full(num_customers, -1)  # picked with first transaction
+
+        # pick country and currency
+        country_frac = self.params['country_frac'].iloc[:, self.fraudster].values
+        new['country'] = random_state.choice(len(country_frac), size=num_customers, p=country_frac)
+        new['currency'] = self.model.sample_currencies(new['country'], self.fraudster)
+
+        # average number of transaction per hour in general; varies per customer
+        trans_per_year = self.params['trans_per_year'][self.fraudster]
+        rand_addition = random_state.normal(0, self.noise_level * trans_per_year, size=num_customers)
+        trans_per_year = np.where(trans_per_year + rand_addition > 0, trans_per_year + rand_addition, trans_per_year)
+        new['avg_trans_per_hour'] = trans_per_year / 366. / 24. * self.params['transaction_motivation'][self.fraudster]
+
+        # transaction probabilities per month/monthday/weekday/hour (diagonal covariance, so independent noise)
+        for name, frac, scale in [('trans_prob_month', 'frac_month', 1200),
+                                  ('trans_prob_monthday', 'frac_monthday', 305),
+                                  ('trans_prob_weekday', 'frac_weekday', 70),
+                                  ('trans_prob_hour', 'frac_hour', 240)]:
+            mean = self.params[frac][:, self.fraudster]
+            trans_prob = mean + random_state.normal(0, np.sqrt(self.noise_level / scale), size=(num_customers, len(mean)))
+            trans_prob[trans_prob < 0] = 0
+            new[name] = trans_prob
+
+        # the part of the transaction probability that only changes per (local) day is computed on first use
+        new['intensity_day'] = np.full(num_customers, -1)
+
+        new['satisfaction'] = np.full(num_customers, satisfaction, dtype=np.float64)
+        new['patience'] = random_state.beta(10, 2, size=num_customers)
+        new['stay'] = np.ones(num_customers, dtype=np.bool_)
+
+        # write the new customers into the spare rows (only the new rows are written)
+        self.reserve(self.size + num_customers)
+        rows = slice(self.size, self.size + num_customers)
+        for name, _, _ in self.FIELDS:
+            buffer = self.buffers[name]
+            buffer[rows] = new[name] if name in new else 0
+        self.size += num_customers
+        self.update_views()
+
+    def remove(self, idx):
+        """
+        Removes the given customers, by moving the last customers into their rows
+        (so only as many rows are copied as customers are removed; the order of the customers changes)
+        :param idx:     indices of the customers to remove
+        """
+        idx = np.unique(idx)
+        if len(idx) == 0:
+            return
+        new_size = self.size - len(idx)
+        # rows below the new size that become free, and rows above it that are still in use
+        holes = idx[idx < new_size]
+        tail = np.ones(self.size - new_size, dtype=np.bool_)
+        tail[idx[idx >= new_size] - new_size] = False
+        moved = new_size + np.flatnonzero(tail)
+        for name, _, _ in self.FIELDS:
+            buffer = self.buffers[name]
+            buffer[holes] = buffer[moved]
+        self.size = new_size
+        self.update_views()
+
+    def keep(self, mask):
+        """
+        Removes all customers for which the mask is False
+        :param mask:    boolean array with one entry per customer
+        """
+        self.remove(np.flatnonzero(~mask))
+
+    def emigration(self):
+        """ Removes all customers that decided not to stay """
+        self.remove(np.flatnonzero(~self.stay))
+
+    def get_transaction_prob(self, local_day, month, day, weekday, hour):
+        """
+        Batched version of BaseCustomer.get_transaction_prob.
+        :param local_day:   local day (days since the epoch) per customer
+        :param month:       local month (0-11) per customer
+        :param day:         local day in month (0-30) per customer
+        :param weekday:     local weekday (0-6) per customer
+        :param hour:        local hour (0-23) per customer
+        :return:            transaction probability per customer
+        """
+        # the transaction probability per month/monthday/weekday only changes when the local day changes,
+        # so we only recompute it for customers for which a new day started
+        stale = np.flatnonzero(self.intensity_day != local_day)
+        if len(stale) > 0:
+            day_intensity = self.avg_trans_per_hour[stale].copy()
+            day_intensity *= 12 * self.trans_prob_month[stale, month[stale]]
+            day_intensity *= 30.5 * self.trans_prob_monthday[stale, day[stale]]
+            day_intensity *= 7 * self.trans_prob_weekday[stale, weekday[stale]]
+            self.day_intensity[stale] = day_intensity
+            self.intensity_day[stale] = local_day[stale]
+
+        trans_prob = self.day_intensity * 24 * self.trans_prob_hour[np.arange(len(self)), hour]
+        if not self.fraudster:
+            trans_prob *= self.satisfaction
+        return trans_prob
+
+    def decide_making_transaction(self, local_day, month, day, weekday, hour):
+        """
+        Batched version of the decide_making_transaction of genuine and fraudulent customers.
+        :return:    indices of the customers that make a transaction in this step
+        """
+        random_state = self.model.random_state
+
+        # reset the fields of the current transaction
+        self.curr_auth_step[:] = 0
+        self.curr_trans_cancelled[:] = False
+
+        # if the card was corrupted, the user is more likely to leave
+        if not self.fraudster:
+            corrupted = np.flatnonzero(self.card_corrupted & self.stay)
+            leave = self.params['stay_after_fraud'] < random_state.uniform(0, 1, size=len(corrupted))
+            self.stay[corrupted[leave]] = False
+
+        make_transaction = self.get_transaction_prob(local_day, month, day, weekday, hour) > random_state.uniform(0, 1, size=len(self))
+        return np.flatnonzero(make_transaction & self.stay)
+
+    def give_authentication(self, idx, amount, merchant):
+        """
+        Batched-state version of give_authentication for a single customer.
+        :param idx:         index of the customer in the population
+        :param amount:      the amount of the current transaction
+        :param merchant:    the merchant of the current transaction
+        :return:            the authentication quality (None if the transaction got cancelled)
+        """
+        if self.fraudster:
+            # we assume that the fraudster cannot provide a second authentication
+            self.curr_trans_cancelled[idx] = True
+            return None
+
+        curr_patience = 0.8 * self.patience[idx] + 0.2 * amount / merchant.max_amount
+        if curr_patience > self.model.random_state.uniform(0, 1):
+            auth_quality = 1
+        else:
+            # cancel the transaction
+            self.curr_trans_cancelled[idx] = True
+            auth_quality = None
+
+        self.curr_auth_step[idx] += 1
+
+        return auth_quality
+
+    def give_authentications(self, idx, amounts, max_amounts):
+        """
+        Batched version of give_authentication, for customers that are asked for authentication at the same time
+        :param idx:             indices of the customers in the population
+        :param amounts:         the amounts of their current transactions
+        :param max_amounts:     the maximal amounts of the merchants of their current transactions
+        """
+        if self.fraudster:
+            # we assume that the fraudster cannot provide a second authentication
+            self.curr_trans_cancelled[idx] = True
+            return
+
+        curr_patience = 0.8 * self.patience[idx] + 0.2 * amounts / max_amounts
+        cancel = curr_patience <= self.model.random_state.uniform(0, 1, size=len(idx))
+        self.curr_trans_cancelled[idx[cancel]] = True
+        self.curr_auth_step[idx] += 1
+
+    def post_process_transaction(self, idx):
+        """
+        Update satisfaction (genuine customers only) and decide whether to stay
+        :param idx:     indices of the customers that made a transaction
+        """
+        random_state = self.model.random_state
+
+        if self.fraudster:
+            self.stay[idx] = self.params['stay_prob'][self.fraudster] > random_state.uniform(0, 1, size=len(idx))
+            return
+
+        # cancelled: -5%, no authentication: +1%, authentication: -1%
+        factor = np.where(self.curr_auth_step[idx] == 0, 1.01, 0.99)
+        factor[self.curr_trans_cancelled[idx]] = 0.95
+        self.satisfaction[idx] = np.clip(self.satisfaction[idx] * factor, 0, 1)
+
+        stay_prob = self.satisfaction[idx] * self.params['stay_prob'][self.fraudster]
+        self.stay[idx] = (1 - stay_prob) <= random_state.uniform(0, 1, size=len(idx))
+
+
+class CustomerView:
+    """
+    Stand-in for a single customer of a CustomerPopulation, exposing the same attributes
+    as a BaseCustomer so that authenticators written for the agent-based model keep working.
+    The fields of the current transaction are set by the model before authorisation.
+    """
+    def __init__(self, population, idx):
+        self.population = population
+        self.model = population.model
+        self.idx = idx
+        self.fraudster = population.fraudster
+
+        # fields for storing the current transaction properties
+        self.curr_merchant = None
+        self.curr_amount = None
+
+    @property
+    def unique_id(self):
+        return self.population.unique_id[self.idx]
+
+    @property
+    def card_id(self):
+        return self.population.card_id[self.idx]
+
+    @property
+    def country_code(self):
+        return self.population.country[self.idx]
+
+    @property
+    def currency_code(self):
+        return self.population.currency[self.idx]
+
+    @property
+    def country(self):
+        return self.model.country_labels[self.population.country[self.idx]]
+
+    @property
+    def currency(self):
+        return self.model.currency_labels[self.population.currency[self.idx]]
+
+    @property
+    def local_datetime(self):
+        # the naive local date of the current transaction
+        return self.model.local_calendar.get_local_datetime(self.population.country[self.idx], self.model.curr_global_hour)
+
+    @property
+    def satisfaction(self):
+        return self.population.satisfaction[self.idx]
+
+    @property
+    def patience(self):
+        return self.population.patience[self.idx]
+
+    @property
+    def stay(self):
+        return self.population.stay[self.idx]
+
+    @property
+    def card_corrupted(self):
+        return self.population.card_corrupted[self.idx]
+
+    @property
+    def curr_auth_step(self):
+        return self.population.curr_auth_step[self.idx]
+
+    @property
+    def curr_trans_cancelled(self):
+        return self.population.curr_trans_cancelled[self.idx]
+
+    @property
+    def trans_prob_month(self):
+        return self.population.trans_prob_month[self.idx]
+
+    @property
+    def trans_prob_monthday(self):
+        return self.population.trans_prob_monthday[self.idx]
+
+    @property
+    def trans_prob_weekday(self):
+        return self.population.trans_prob_weekday[self.idx]
+
+    @property
+    def trans_prob_hour(self):
+        return self.population.trans_prob_hour[self.idx]
+
+    def give_authentication(self):
+        return self.population.give_authentication(self.idx, self.curr_amount, self.curr_merchant)
+
+
+class TransactionCustomers:
+    """
+    The customers of the transactions of one step, in the order of the arrays of a transaction batch
+    (see AbstractAuthenticator.authorise_batch). The CustomerViews are only created when they are accessed,
+    so authenticators that decide on the arrays alone don't create one per transaction.
+    """
+    def __init__(self, model, populations, active, merchant_ids, amounts):
+        """
+        :param model:           the VectorizedTransactionModel
+        :param populations:     the populations of customers and fraudsters
+        :param active:          per population, the indices of the customers that make a transaction
+        :param merchant_ids:    per population, the merchant ID per transaction
+        :param amounts:         per population, the amount per transaction
+        """
+        self.model = model
+        self.populations = populations
+        self.active = active
+        self.merchant_ids = merchant_ids
+        self.amounts = amounts
+        # position of the first transaction of each population
+        self.offsets = np.cumsum([0] + [len(idx) for idx in active])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        i = int(np.searchsorted(self.offsets, k, side='right')) - 1
+        return self.get_view(i, k - self.offsets[i])
+
+    def __iter__(self):
+        for i in range(len(self.populations)):
+            for j in range(len(self.active[i])):
+                yield self.get_view(i, j)
+
+    def get_view(self, i, j):
+        """
+        :return:    the CustomerView of the j-th transaction of population i
+        """
+        return self.model.get_customer_view(self.populations[i], self.active[i][j], self.merchant_ids[i][j], self.amounts[i][j])
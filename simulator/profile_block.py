@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class ProfileBlock:
+    """
+    The transaction probability profiles (per month, day in month, weekday and hour) of all customers
+    and fraudsters, pooled into one shared 2-D array with one row per agent.
+    This avoids four small arrays (each with its own object overhead) per agent.
+    Rows of agents that left are reused for new agents.
+    """
+    COLUMNS = (('month', 12), ('monthday', 31), ('weekday', 7), ('hour', 24))
+
+    def __init__(self, capacity=1024):
+        """
+        :param capacity:    initial number of rows (the block grows when needed)
+        """
+        self.offsets = dict()
+        width = 0
+        for name, size in self.COLUMNS:
+            self.offsets[name] = width
+            width += size
+        self.sizes = dict(self.COLUMNS)
+        self.values = np.zeros((capacity, width))
+        self.num_rows = 0
+        self.free_rows = []
+
+    def add(self, *profiles):
+        """
+        Store the profiles of a new agent
+        :param profiles:    the arrays per month, day in month, weekday and hour (in that order)
+        :return:            the row of the agent
+        """
+        if len(self.free_rows) > 0:
+            row = self.free_rows.pop()
+        else:
+            if self.num_rows == len(self.values):
+                values = np.zeros((2 * len(self.values), self.values.shape[1]))
+                values[:self.num_rows] = self.values
+                self.values = values
+            row = self.num_rows
+            self.num_rows += 1
+        self.values[row] = np.concatenate(profiles)
+        return row
+
+    def remove(self, row):
+        """
+        Free the row of an agent that left, so it can be reused
+        :param row:     the row of the agent
+        """
+        self.free_rows.append(row)
+
+    def get(self, row, name):
+        """
+        :param row:     the row of the agent
+        :param name:    'month', 'monthday', 'weekday' or 'hour'
+        :return:        the profile (a view into the block; don't keep it, since the block can be reallocated)
+        """
+        offset = self.offsets[name]
+        return self.values[row, offset:offset + self.sizes[name]]
+
+    def item(self, row, name, idx):
+        """
+        :return:    the entry idx of a profile, as a python float
+        """
+        return self.values.item(row, self.offsets[name] + idx)
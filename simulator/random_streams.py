@@ -0,0 +1,47 @@
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Hands out one random stream per agent, derived from the seed of the model and the ID of the agent.
+    Every stream is a numpy Generator on top of a Philox counter-based bit generator, keyed by
+    (seed, agent kind, agent ID). Compared to a RandomState per agent (which carries several KB of
+    Mersenne Twister state and has to be seeded from the model's random state) a stream is small,
+    cheap to create, and doesn't depend on the order in which agents are created.
+    Since the streams are Generators, every agent can draw batches (size=...) from its own stream.
+    """
+    CUSTOMER = 0
+    FRAUDSTER = 1
+    MERCHANT = 2
+
+    def __init__(self, seed):
+        """
+        :param seed:    the seed of the model (any non-negative integer below 2**64)
+        """
+        self.seed = int(seed) % 2**64
+
+    def get_key(self, kind, agent_id):
+        """
+        The 128 bit Philox key of an agent: the seed in the lower 64 bits,
+        the agent kind and ID in the upper 64 bits
+        :param kind:        CUSTOMER, FRAUDSTER or MERCHANT
+        :param agent_id:    the ID of the agent (below 2**56)
+        :return:            integer key
+        """
+        return self.seed | (((int(kind) << 56) | int(agent_id)) << 64)
+
+    def get_stream(self, kind, agent_id):
+        """
+        :param kind:        CUSTOMER, FRAUDSTER or MERCHANT
+        :param agent_id:    the ID of the agent
+        :return:            a numpy Generator for this agent
+        """
+        return np.random.Generator(np.random.Philox(key=self.get_key(kind, agent_id)))
+
+    def get_streams(self, kind, agent_ids):
+        """
+        :param kind:        CUSTOMER, FRAUDSTER or MERCHANT
+        :param agent_ids:   iterable with agent IDs
+        :return:            list with one Generator per agent
+        """
+        return [self.get_stream(kind, agent_id) for agent_id in agent_ids]
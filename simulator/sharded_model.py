@@ -0,0 +1,272 @@
+from collections import namedtuple
+from multiprocessing import Process, Pipe
+from authenticators.simple_authenticators import NeverSecondAuthenticator
+from simulator.transaction_model import TransactionModel
+from simulator import parameters
+import numpy as np
+import pandas as pd
+import traceback
+
+
+# a card of a customer in another shard that fraudsters can steal (has the fields fraudsters use from a victim)
+RemoteVictim = namedtuple('RemoteVictim', ['unique_id', 'card_id', 'country_code', 'currency_code'])
+
+
+class ShardTransactionModel(TransactionModel):
+    """
+    One shard of a ShardedSimulation: a TransactionModel with a share 1/num_shards of the customers and fraudsters.
+    Customer IDs and card IDs are interleaved over the shards (ID % num_shards is the shard), so they are unique
+    over all shards. Every shard has all merchants.
+
+    The interactions with other shards are exchanged once per step, through the coordinator:
+    the cards that fraudsters can steal (added to / removed from the victim pool), and the stolen
+    cards of other shards that were used in successful fraudulent transactions.
+    """
+    def __init__(self, model_parameters, shard_idx, num_shards, authenticator=NeverSecondAuthenticator(), scheduler=None):
+        self.shard_idx = shard_idx
+        self.num_shards = num_shards
+
+        # messages for the other shards, collected during a step
+        self.new_victims = []
+        self.departed_victims = []
+        self.corrupted_remote_cards = []
+
+        # number of customers when the logs of the current step were collected (for the mean satisfaction)
+        self.num_collected_customers = 0
+
+        super().__init__(model_parameters, authenticator, scheduler)
+        self.population_share = 1. / num_shards
+
+    def get_shard_count(self, total):
+        """ the number of customers/fraudsters of this shard, if there are total in all shards """
+        return total // self.num_shards + int(self.shard_idx < total % self.num_shards)
+
+    def initialise_customers(self):
+        num_customers = self.parameters['num_customers']
+        self.parameters['num_customers'] = self.get_shard_count(num_customers)
+        customers = super().initialise_customers()
+        self.parameters['num_customers'] = num_customers
+        return customers
+
+    def initialise_fraudsters(self):
+        num_fraudsters = self.parameters['num_fraudsters']
+        self.parameters['num_fraudsters'] = self.get_shard_count(num_fraudsters)
+        fraudsters = super().initialise_fraudsters()
+        self.parameters['num_fraudsters'] = num_fraudsters
+        return fraudsters
+
+    def get_next_customer_id(self, fraudster):
+        return super().get_next_customer_id(fraudster) * self.num_shards + self.shard_idx
+
+    def get_next_card_id(self):
+        return super().get_next_card_id() * self.num_shards + self.shard_idx
+
+    def register_card(self, customer):
+        super().register_card(customer)
+        if not customer.fraudster and customer.unique_id in self.victim_pool.position:
+            self.new_victims.append(RemoteVictim(customer.unique_id, customer.card_id, customer.country_code, customer.currency_code))
+
+    def unregister_card(self, customer):
+        if not customer.fraudster and customer.unique_id in self.victim_pool.position:
+            self.departed_victims.append(customer.unique_id)
+        super().unregister_card(customer)
+
+    def inform_attacked_customers(self):
+        super().inform_attacked_customers()
+        # cards of customers in other shards are corrupted by their own shard
+        self.corrupted_remote_cards.extend(f.card_id for f in self.fraudsters if f.active and f.curr_trans_success
+                                           and f.card_id % self.num_shards != self.shard_idx)
+
+    def emigration(self):
+        self.num_collected_customers = len(self.customers)
+        super().emigration()
+
+    def receive_messages(self, messages):
+        """
+        Apply the messages of the other shards from the previous step
+        :param messages:    dict with new_victims, departed_victims and corrupted_cards
+        """
+        for victim in messages['new_victims']:
+            self.victim_pool.add(victim)
+        for unique_id in messages['departed_victims']:
+            self.victim_pool.remove_id(unique_id)
+        for card_id in messages['corrupted_cards']:
+            self.corrupt_card(card_id)
+
+    def send_messages(self):
+        """
+        :return:    the messages of this step for the other shards, and the mean satisfaction (with its weight)
+        """
+        messages = {'new_victims': self.new_victims,
+                    'departed_victims': self.departed_victims,
+                    'corrupted_cards': self.corrupted_remote_cards,
+                    'satisfaction': (self.log_collector.model_vars['Satisfaction'][-1], self.num_collected_customers),
+                    'terminated': self.terminated}
+        self.new_victims = []
+        self.departed_victims = []
+        self.corrupted_remote_cards = []
+        return messages
+
+
+def run_shard(connection, model_parameters, shard_idx, num_shards, authenticator_factory, scheduler_factory):
+    """
+    Main loop of a shard process: step the shard whenever the coordinator asks for it.
+    Every reply is a pair (status, data); if the shard fails, it replies ('error', traceback) and stops.
+    """
+    try:
+        scheduler = scheduler_factory() if scheduler_factory is not None else None
+        model = ShardTransactionModel(model_parameters, shard_idx, num_shards, authenticator_factory(), scheduler)
+        while True:
+            command, data = connection.recv()
+            if command == 'step':
+                model.receive_messages(data)
+                model.step()
+                connection.send(('ok', model.send_messages()))
+            elif command == 'agent_vars':
+                connection.send(('ok', model.log_collector.get_agent_vars_dataframe()))
+            elif command == 'close':
+                break
+    except (EOFError, KeyboardInterrupt):
+        # the coordinator is gone or interrupted
+        pass
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    connection.close()
+
+
+class ShardedSimulation:
+    """
+    Runs one simulation split over several processes. The customers and fraudsters are partitioned over
+    num_shards ShardTransactionModels, which are stepped in parallel. After every step, the coordinator
+    routes the messages between the shards (cards to steal, corrupted cards); they are applied by all shards
+    before the next step, so the results only depend on the seed and the number of shards.
+    The logs of the shards are merged into one log, ordered by step.
+    If a shard fails, its traceback is raised in the coordinator as a RuntimeError.
+    Use it as a context manager (or call close) to stop the shard processes.
+    """
+    def __init__(self, model_parameters=None, num_shards=4, authenticator_factory=NeverSecondAuthenticator,
+                 scheduler_factory=None, poll_seconds=1.):
+        """
+        :param model_parameters:        the parameters of the whole simulation (default parameters if None)
+        :param num_shards:              the number of shards (processes)
+        :param authenticator_factory:   picklable function returning a new authenticator (called in every shard)
+        :param scheduler_factory:       picklable function returning a new scheduler for a shard (e.g. a scheduler
+                                        class; RandomActivation if None)
+        :param poll_seconds:            how often to check that a shard is still alive while waiting for it
+        """
+        if model_parameters is None:
+            model_parameters = parameters.get_default_parameters()
+        self.parameters = model_parameters
+        self.num_shards = num_shards
+        self.poll_seconds = poll_seconds
+        self.terminated = False
+
+        # the seed of every shard is derived from the seed of the simulation
+        shard_seeds = np.random.RandomState(model_parameters['seed']).randint(0, np.iinfo(np.int32).max, size=num_shards)
+
+        self.connections = []
+        self.processes = []
+        for shard_idx in range(num_shards):
+            shard_parameters = dict(model_parameters)
+            shard_parameters['seed'] = int(shard_seeds[shard_idx])
+            connection, shard_connection = Pipe()
+            process = Process(target=run_shard, args=(shard_connection, shard_parameters, shard_idx, num_shards,
+                                                      authenticator_factory, scheduler_factory))
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        # messages for every shard for the next step
+        self.inboxes = [{'new_victims': [], 'departed_victims': [], 'corrupted_cards': []} for _ in range(num_shards)]
+
+        # mean satisfaction of all customers per step
+        self.satisfaction = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def receive(self, shard_idx):
+        """
+        Wait for the reply of a shard, while checking that its process is still alive
+        :param shard_idx:   the index of the shard
+        :return:            the data of the reply
+        :raise RuntimeError:    if the shard failed or its process exited
+        """
+        connection, process = self.connections[shard_idx], self.processes[shard_idx]
+        while not connection.poll(self.poll_seconds):
+            if not process.is_alive():
+                raise RuntimeError('shard {} exited with code {}'.format(shard_idx, process.exitcode))
+        try:
+            status, data = connection.recv()
+        except (EOFError, OSError):
+            raise RuntimeError('shard {} exited with code {}'.format(shard_idx, process.exitcode))
+        if status == 'error':
+            raise RuntimeError('shard {} failed:\n{}'.format(shard_idx, data))
+        return data
+
+    def receive_all(self):
+        return [self.receive(shard_idx) for shard_idx in range(self.num_shards)]
+
+    def step(self):
+        for connection, inbox in zip(self.connections, self.inboxes):
+            connection.send(('step', inbox))
+        outboxes = self.receive_all()
+
+        # route the messages (in order of the shards, so the result is reproducible)
+        self.inboxes = [{'new_victims': [], 'departed_victims': [], 'corrupted_cards': []} for _ in range(self.num_shards)]
+        for sender, outbox in enumerate(outboxes):
+            for receiver, inbox in enumerate(self.inboxes):
+                if receiver != sender:
+                    inbox['new_victims'].extend(outbox['new_victims'])
+                    inbox['departed_victims'].extend(outbox['departed_victims'])
+            for card_id in outbox['corrupted_cards']:
+                self.inboxes[card_id % self.num_shards]['corrupted_cards'].append(card_id)
+
+        # mean satisfaction over all shards, weighted by their number of customers
+        satisfaction, num_customers = zip(*[outbox['satisfaction'] for outbox in outboxes])
+        self.satisfaction.append(np.average(satisfaction, weights=num_customers) if sum(num_customers) > 0 else np.nan)
+
+        self.terminated = all(outbox['terminated'] for outbox in outboxes)
+
+    def run(self):
+        """ Step until termination """
+        while not self.terminated:
+            self.step()
+
+    def get_agent_vars_dataframe(self):
+        """
+        :return:    the transaction logs of all shards, ordered by step (and by shard within a step)
+        """
+        for connection in self.connections:
+            connection.send(('agent_vars', None))
+        logs = self.receive_all()
+        logs = [log for log in logs if log is not None]
+        if len(logs) == 0:
+            return None
+        log = pd.concat(logs)
+        # stable sort, so the transactions of a step stay in the order of the shards
+        return log.iloc[np.argsort(log.index.get_level_values('Step'), kind='mergesort')]
+
+    def get_model_vars_dataframe(self):
+        return pd.DataFrame({'Satisfaction': self.satisfaction})
+
+    def close(self, timeout=10.):
+        """
+        Stop the shard processes; shards that don't stop within the timeout (in seconds) are terminated
+        """
+        for connection, process in zip(self.connections, self.processes):
+            if process.is_alive():
+                try:
+                    connection.send(('close', None))
+                except OSError:
+                    # the shard closed its end of the pipe
+                    pass
+        for connection, process in zip(self.connections, self.processes):
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            connection.close()
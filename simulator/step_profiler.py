@@ -0,0 +1,76 @@
+from simulator.log_collector import ColumnBuffer
+import numpy as np
+import time
+
+
+class StepProfiler:
+    """
+    Records the wall time of every phase of a step of the TransactionModel (see TransactionModel.step),
+    and per step the number of transactions, authentications and migrations.
+    Attach it with TransactionModel.set_profiler; models without a profiler don't measure anything.
+    """
+    PHASES = ('agents', 'inform_attacked_customers', 'log_collector', 'emigration', 'immigration')
+    COUNTS = ('transactions', 'authentications', 'emigrants', 'immigrants')
+
+    def __init__(self, callback=None):
+        """
+        :param callback:    optional function that is called after every step with the record of the step
+                            (a dict with the step, the seconds per phase and the counts)
+        """
+        self.callback = callback
+        self.columns = {'step': ColumnBuffer(np.int64)}
+        self.columns.update({phase: ColumnBuffer(np.float64) for phase in self.PHASES})
+        self.columns.update({name: ColumnBuffer(np.int64) for name in self.COUNTS})
+        self.record = None
+        self.last_time = None
+
+    def __getstate__(self):
+        # the callback is not pickled with checkpoints of the model (it can be a lambda)
+        state = self.__dict__.copy()
+        state['callback'] = None
+        return state
+
+    def start_step(self, step):
+        """
+        :param step:    the global hour of the step
+        """
+        self.record = dict.fromkeys(self.PHASES, 0.)
+        self.record.update(dict.fromkeys(self.COUNTS, 0))
+        self.record['step'] = step
+        self.last_time = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Add the time since the start of the step (or since the last lap) to the given phase
+        """
+        now = time.perf_counter()
+        self.record[phase] += now - self.last_time
+        self.last_time = now
+
+    def count(self, name, value):
+        self.record[name] += value
+
+    def end_step(self):
+        for name, column in self.columns.items():
+            column.extend([self.record[name]])
+        if self.callback is not None:
+            self.callback(self.record)
+
+    def get_arrays(self):
+        """
+        :return:    dict with one array per column (step, seconds per phase, counts), with one entry per step
+        """
+        return {name: column.get_values().copy() for name, column in self.columns.items()}
+
+    def get_dataframe(self):
+        """
+        :return:    pandas DataFrame with one row per step
+        """
+        import pandas as pd
+        return pd.DataFrame(self.get_arrays(), columns=list(self.columns)).set_index('step')
+
+    def get_summary(self):
+        """
+        :return:    dict with the total seconds per phase and the total counts over all steps
+        """
+        return {name: column.get_values().sum() for name, column in self.columns.items() if name != 'step'}
@@ -1,16 +1,31 @@
 from simulator.merchant import Merchant
 from mesa.time import RandomActivation
-from simulator.log_collector import LogCollector
+from simulator.log_collector import LogCollector, TRANSACTION_LOG_DTYPES, TRANSACTION_LOG_DATETIMES
+from simulator.local_calendar import LocalCalendar
+from simulator.victim_pool import VictimPool
+from simulator.random_streams import RandomStreams
+from simulator.agent_population import AgentPopulation
+from simulator.profile_block import ProfileBlock
+from simulator.event_scheduler import NextTransactionScheduler
+from simulator import checkpoint
 from simulator import parameters
 from mesa import Model
 from authenticators.simple_authenticators import NeverSecondAuthenticator
 from simulator.customers import GenuineCustomer, FraudulentCustomer
-from datetime import timedelta
+from datetime import datetime, timedelta
 import numpy as np
+import time
 
 
 class TransactionModel(Model):
-    def __init__(self, model_parameters, authenticator=NeverSecondAuthenticator(), scheduler=None):
+    def __init__(self, model_parameters, authenticator=NeverSecondAuthenticator(), scheduler=None, log_sink=None):
+        """
+        :param model_parameters:    dict of parameters (see simulator.parameters); default parameters if None
+        :param authenticator:       the authenticator that processes the transactions
+        :param scheduler:           mesa scheduler for the customers/fraudsters (RandomActivation if None)
+        :param log_sink:            optional sink (e.g. CsvLogSink) to which the transaction log is written in
+                                    chunks, for runs whose log doesn't fit into memory
+        """
         super().__init__(seed=123)
 
         # load parameters
@@ -29,94 +44,420 @@ class TransactionModel(Model):
         # random internal state
         self.random_state = np.random.RandomState(self.parameters["seed"])
 
-        # current date
-        self.curr_global_date = self.parameters['start_date']
+        # one random stream per merchant/customer/fraudster, derived from the seed and the agent's ID
+        self.random_streams = RandomStreams(self.parameters["seed"])
+
+        # the clock of the model: the number of hours since the start date (see curr_global_date for the date)
+        self.curr_global_hour = 0
+
+        # table with the local month/day/weekday/hour per country, so customers don't have to convert dates
+        self.local_calendar = LocalCalendar(self.parameters['start_date'], self.parameters['country_frac'].index.values)
+
+        # the model terminates at this hour, which is the first hour after the day of the end date
+        self.end_hour = self.get_end_hour()
 
         # set termination status
         self.terminated = False
 
+        # observers that get the metrics of every step (see simulator.observers), and since when
+        # (wall time, global hour) they observe the model, to estimate the progress
+        self.observers = []
+        self.observed_since = None
+
+        # optional StepProfiler that records the time and counts per phase of every step (off if None)
+        self.profiler = None
+
+        # where and how often (in steps) to write checkpoints (none if None)
+        self.checkpoint_path = None
+        self.checkpoint_every = None
+
+        # the share of the whole population simulated by this model (smaller than 1 for a shard, see ShardedSimulation)
+        self.population_share = 1.
+
         # create merchants, customers and fraudsters
         self.next_customer_id = 0
         self.next_fraudster_id = 0
         self.next_card_id = 0
+        self.initialise_category_codes()
         self.merchants = self.initialise_merchants()
+        self.merchants_by_id = {m.unique_id: m for m in self.merchants}
+        self.merchant_tables = self.initialise_merchant_tables()
+        self.currency_tables = self.initialise_currency_tables()
+        self.initialise_agent_state()
         self.customers = self.initialise_customers()
         self.fraudsters = self.initialise_fraudsters()
 
         # set up a scheduler
-        self.schedule = scheduler if scheduler is not None else RandomActivation(self)
+        self.schedule = self.initialise_schedule(scheduler)
 
         # we add to the log collector whether transaction was successful
         self.log_collector = self.initialise_log_collector()
+        self.log_collector.set_categories({'Country': self.country_labels, 'Currency': self.currency_labels})
+        if log_sink is not None:
+            self.log_collector.set_sink(log_sink)
 
     @staticmethod
     def initialise_log_collector():
         return LogCollector(
-            agent_reporters={"Global_Date": lambda c: c.model.curr_global_date.replace(tzinfo=None),
-                             "Local_Date": lambda c: c.local_datetime.replace(tzinfo=None),
+            agent_reporters={"Global_Date": lambda c: c.model.local_calendar.get_global_epoch_second(c.model.curr_global_hour),
+                             "Local_Date": lambda c: c.get_local_epoch_second(),
                              "CardID": lambda c: c.card_id,
                              "MerchantID": lambda c: c.curr_merchant.unique_id,
                              "Amount": lambda c: c.curr_amount,
-                             "Currency": lambda c: c.currency,
-                             "Country": lambda c: c.country,
+                             "Currency": lambda c: c.currency_code,
+                             "Country": lambda c: c.country_code,
                              "Target": lambda c: c.fraudster,
                              "AuthSteps": lambda c: c.curr_auth_step,
                              "TransactionCancelled": lambda c: c.curr_trans_cancelled,
                              "TransactionSuccessful": lambda c: not c.curr_trans_cancelled},
             model_reporters={
-                "Satisfaction": lambda m: sum((customer.satisfaction for customer in m.customers)) / len(m.customers)})
+                "Satisfaction": lambda m: m.customers.get_mean_satisfaction()},
+            agent_dtypes=TRANSACTION_LOG_DTYPES,
+            datetime_vars=TRANSACTION_LOG_DATETIMES)
+
+    @property
+    def curr_global_date(self):
+        """
+        The (timezone-aware) date of the current step; the model itself only uses curr_global_hour
+        """
+        return self.parameters['start_date'] + timedelta(hours=self.curr_global_hour)
+
+    def get_end_hour(self):
+        """
+        :return:    the first global hour of which the date is after the end date
+        """
+        end = datetime.combine(self.parameters['end_date'].date() + timedelta(days=1), datetime.min.time())
+        return int(np.ceil((end - self.local_calendar.start_date_global).total_seconds() / 3600))
+
+    def get_global_hour(self, date):
+        """
+        :param date:    timezone-aware date
+        :return:        the number of hours from the start date to the given date
+        """
+        return (date - self.parameters['start_date']).total_seconds() / 3600
 
     def inform_attacked_customers(self):
         fraud_card_ids = [f.card_id for f in self.fraudsters if f.active and f.curr_trans_success]
         for card_id in fraud_card_ids:
-            customer = next((c for c in self.customers if c.card_id == card_id), None)
-            if customer is not None:
-                customer.card_got_corrupted()
+            self.corrupt_card(card_id)
 
-    def step(self):
+    def corrupt_card(self, card_id):
+        """
+        Inform the customer with the given card (if it is still there) that the card got corrupted
+        """
+        customer = self.customers_by_card.get(card_id)
+        if customer is not None:
+            customer.card_got_corrupted()
+            if isinstance(self.schedule, NextTransactionScheduler):
+                self.schedule.reschedule(customer)
+
+    def get_active_agents(self):
+        """
+        :return:    the customers/fraudsters that made a transaction in the current step
+        """
+        if isinstance(self.schedule, NextTransactionScheduler):
+            # only the agents that were woken up in this step can be active
+            return self.schedule.get_active_agents()
+        return [agent for agent in self.schedule.agents if agent.active]
 
-        # print some logs every mont
-        if self.curr_global_date.month != (self.curr_global_date - timedelta(hours=1)).month:
-            print(self.curr_global_date.date())
-            print('num customers:', len(self.customers))
-            print('num fraudsters:', len(self.fraudsters))
-            print('')
+    def register_card(self, customer):
+        """
+        Add a customer/fraudster to the card ID index, once its card ID is assigned.
+        A card belongs to at most one genuine customer, but several fraudsters can use the same (stolen) card.
+        :param customer:    the customer or fraudster that got a card ID
+        """
+        if customer.fraudster:
+            self.fraudsters_by_card.setdefault(customer.card_id, []).append(customer)
+        else:
+            self.customers_by_card[customer.card_id] = customer
+            self.victim_pool.add(customer)
 
-        # this calls the step function of each agent in the schedule (customer, fraudster)
-        self.schedule.agents = []
-        self.schedule.agents.extend(self.customers)
-        self.schedule.agents.extend(self.fraudsters)
-        self.schedule.step()
+    def unregister_card(self, customer):
+        """
+        Remove a customer/fraudster from the card ID index, e.g. when it leaves the simulation
+        :param customer:    the customer or fraudster to remove
+        """
+        if customer.card_id is None:
+            return
+        if customer.fraudster:
+            fraudsters = self.fraudsters_by_card.get(customer.card_id, [])
+            if customer in fraudsters:
+                fraudsters.remove(customer)
+            if len(fraudsters) == 0:
+                self.fraudsters_by_card.pop(customer.card_id, None)
+        elif self.customers_by_card.get(customer.card_id) is customer:
+            del self.customers_by_card[customer.card_id]
+            self.victim_pool.remove(customer)
+
+    def get_customer_by_card(self, card_id):
+        """
+        :return:    the genuine customer with the given card ID (None if there is none)
+        """
+        return self.customers_by_card.get(card_id)
+
+    def get_fraudsters_by_card(self, card_id):
+        """
+        :return:    list of the fraudsters that use the given card ID
+        """
+        return self.fraudsters_by_card.get(card_id, [])
+
+    def step(self):
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_step(self.curr_global_hour)
+        # let all customers and fraudsters decide whether to make a transaction
+        self.step_agents()
+        if profiler is not None:
+            profiler.lap('agents')
+        counts = None
+        if profiler is not None or len(self.observers) > 0:
+            counts = self.get_transaction_counts()
+        if profiler is not None:
+            profiler.count('transactions', counts[0])
+            profiler.count('authentications', counts[1])
 
         # inform the customers whose card got corrupted
         self.inform_attacked_customers()
+        if profiler is not None:
+            profiler.lap('inform_attacked_customers')
 
         # write new transactions to log
         self.log_collector.collect(self)
+        if profiler is not None:
+            profiler.lap('log_collector')
 
         # migration of customers/fraudsters
-        self.customer_migration()
+        if profiler is None:
+            self.customer_migration()
+        else:
+            num_agents = len(self.customers) + len(self.fraudsters)
+            self.emigration()
+            profiler.lap('emigration')
+            num_stayed = len(self.customers) + len(self.fraudsters)
+            self.immigration()
+            profiler.lap('immigration')
+            profiler.count('emigrants', num_agents - num_stayed)
+            profiler.count('immigrants', len(self.customers) + len(self.fraudsters) - num_stayed)
+            profiler.end_step()
 
         # update time
-        self.curr_global_date = self.curr_global_date + timedelta(hours=1)
+        self.curr_global_hour += 1
 
         # check if termination criterion met
-        if self.curr_global_date.date() > self.parameters['end_date'].date():
+        if self.curr_global_hour >= self.end_hour:
             self.terminated = True
 
-    def process_transaction(self, customer):
-        self.authenticator.authorise_transaction(customer)
+            # write what is left of the transaction log
+            self.flush_log()
+
+        if len(self.observers) > 0:
+            metrics = self.get_step_metrics(counts)
+            for observer in self.observers:
+                observer.on_step(self, metrics)
+
+        if self.checkpoint_every is not None and self.curr_global_hour % self.checkpoint_every == 0:
+            self.save_checkpoint(self.checkpoint_path)
+
+    def __getstate__(self):
+        # observers are not pickled with checkpoints/forks (they can hold streams, and measure wall time)
+        state = self.__dict__.copy()
+        state['observers'] = []
+        state['observed_since'] = None
+        return state
+
+    def __setstate__(self, state):
+        # the reporters of the log collector are not pickled, so we set them again
+        self.__dict__.update(state)
+        log_collector = self.initialise_log_collector()
+        self.log_collector.set_reporters(log_collector.model_reporters, log_collector.agent_reporters)
+
+    def set_profiler(self, profiler):
+        """
+        :param profiler:    StepProfiler that records every following step (None to stop profiling)
+        """
+        self.profiler = profiler
+
+    def get_transaction_counts(self):
+        """
+        :return:    the number of transactions in the current step, the number of authentications requested,
+                    and the number of successful fraudulent transactions
+        """
+        active = self.get_active_agents()
+        # fraudsters can't authenticate, so for them the transaction got cancelled
+        num_authentications = sum(a.curr_trans_cancelled if a.fraudster else a.curr_auth_step for a in active)
+        num_fraud_successes = sum(1 for a in active if a.fraudster and not a.curr_trans_cancelled)
+        return len(active), int(num_authentications), num_fraud_successes
+
+    def add_observer(self, observer):
+        """
+        :param observer:    StepObserver (e.g. a ProgressReporter) that gets the metrics of every following step
+        """
+        if len(self.observers) == 0:
+            self.observed_since = (time.perf_counter(), self.curr_global_hour)
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def get_step_metrics(self, counts):
+        """
+        :param counts:      the counts of get_transaction_counts, after the agents were stepped
+        :return:            dict with the metrics of the step (see StepObserver.on_step)
+        """
+        start_time, start_hour = self.observed_since
+        seconds = time.perf_counter() - start_time
+        steps_per_second = (self.curr_global_hour - start_hour) / seconds if seconds > 0 else 0.
+
+        remaining_steps = self.end_hour - self.curr_global_hour
+        eta_seconds = None
+        if steps_per_second > 0:
+            eta_seconds = max(0., remaining_steps) / steps_per_second
+
+        return {'step': self.curr_global_hour - 1,
+                'date': self.parameters['start_date'] + timedelta(hours=self.curr_global_hour - 1),
+                'num_customers': len(self.customers),
+                'num_fraudsters': len(self.fraudsters),
+                'transactions': counts[0],
+                'fraud_successes': counts[2],
+                'mean_satisfaction': float(self.get_social_satisfaction()),
+                'steps_per_second': steps_per_second,
+                'eta_seconds': eta_seconds}
+
+    def set_checkpoints(self, path, every_n_steps):
+        """
+        Write a checkpoint of the model every n steps (the file is overwritten every time)
+        :param path:            the file to write the checkpoints to
+        :param every_n_steps:   number of steps between checkpoints (None to stop writing checkpoints)
+        """
+        self.checkpoint_path = path
+        self.checkpoint_every = every_n_steps
+
+    def save_checkpoint(self, path):
+        """
+        Save the complete state of the simulation (date, customers with their random states, ID counters,
+        collected logs, ...), so that it can be resumed exactly with load_checkpoint
+        """
+        checkpoint.save_checkpoint(self, path)
+
+    @staticmethod
+    def load_checkpoint(path):
+        """
+        Load a model saved with save_checkpoint; stepping it continues the simulation as if it was never stopped
+        """
+        return checkpoint.load_checkpoint(path)
+
+    def run_until(self, date):
+        """
+        Step the model until the given (timezone-aware) date is reached, or until termination
+        """
+        end_hour = self.get_global_hour(date)
+        while not self.terminated and self.curr_global_hour < end_hour:
+            self.step()
+
+    def flush_log(self):
+        """
+        Write the transactions collected since the last chunk to the log sink (if there is one), e.g. when
+        a run is stopped before termination; at termination this happens automatically
+        """
+        self.log_collector.flush()
+
+    def fork(self, authenticator):
+        """
+        Copy the model in its current state, to continue the simulation with another authenticator.
+        Note that forks in the same process share python's global random generator (used to shuffle
+        the agents); see experiments.parallel_runner.run_forks to continue forks in separate processes.
+        :param authenticator:   the authenticator of the copy
+        :return:                the copy
+        """
+        model = checkpoint.loads_checkpoint(checkpoint.dumps_checkpoint(self))
+        model.authenticator = authenticator
+        model.set_checkpoints(None, None)
+        return model
+
+    def step_agents(self):
+        # the customers/fraudsters only prepare their transaction in their step,
+        # and all transactions of this step are authorised in one call afterwards
+        self.pending_transactions = []
+
+        # this calls the step function of each agent in the schedule (customer, fraudster)
+        self.schedule.step()
+
+        self.complete_pending_transactions()
+
+    def complete_pending_transactions(self):
+        """
+        Authorise the transactions collected in this step in one batch (see AbstractAuthenticator.authorise_batch),
+        ask the selected customers for authentication, and let all customers complete their transaction
+        """
+        pending = self.pending_transactions
+        self.pending_transactions = None
+        if not pending:
+            return
+
+        authenticate = self.authenticator.authorise_batch(self.get_transaction_batch(pending), self)
+        for customer, second_authentication in zip(pending, authenticate):
+            if second_authentication:
+                customer.give_authentication()
+            # like the authenticators' authorise_transaction, this doesn't report whether the transaction went through
+            customer.complete_transaction(None)
+
+    @staticmethod
+    def get_transaction_batch(customers):
+        """
+        :param customers:   the customers/fraudsters with a pending transaction
+        :return:            dict with one array per transaction field, and the customers
+        """
+        return {'customers': customers,
+                'amount': np.array([c.curr_amount for c in customers], dtype=np.float64),
+                'merchant_id': np.array([c.curr_merchant.unique_id for c in customers], dtype=np.int64),
+                'country': np.array([c.country_code for c in customers], dtype=np.int64),
+                'currency': np.array([c.currency_code for c in customers], dtype=np.int64),
+                'card_id': np.array([c.card_id for c in customers], dtype=np.int64),
+                'fraudster': np.array([c.fraudster for c in customers], dtype=np.int64)}
 
     def customer_migration(self):
+        self.emigration()
+        self.immigration()
 
-        # emigration
-        self.customers = [c for c in self.customers if c.stay]
-        self.fraudsters = [f for f in self.fraudsters if f.stay]
+    def emigration(self):
+        # the customers/fraudsters that decided to leave told us so during their step
+        for agent in self.departures:
+            self.remove_agent(agent)
+        self.departures = []
 
-        # immigration
+    def immigration(self):
         self.immigration_customers()
         self.immigration_fraudsters()
 
+    def leave(self, agent):
+        """
+        Called by a customer/fraudster that decided not to stay; it is removed in the next migration
+        :param agent:   the customer or fraudster that leaves
+        """
+        self.departures.append(agent)
+
+    def remove_now(self, agent):
+        """
+        Remove a customer/fraudster right away instead of in the next migration (e.g. because its card got
+        blocked), so that it is no longer in the card index, the victim pool and the schedule
+        :param agent:   the customer or fraudster to remove
+        """
+        agent.stay = False
+        self.remove_agent(agent)
+
+    def remove_agent(self, agent):
+        # an agent can already be removed (by remove_now) when it is in the departures
+        if agent not in (self.fraudsters if agent.fraudster else self.customers):
+            return
+        self.unregister_card(agent)
+        if agent.fraudster:
+            self.fraudsters.remove(agent)
+        else:
+            self.customers.remove(agent)
+        self.schedule.remove(agent)
+        self.profiles.remove(agent.profile_row)
+
     def immigration_customers(self):
 
         fraudster = 0
@@ -125,16 +466,15 @@ class TransactionModel(Model):
         num_transactions = self.parameters['trans_per_year'][fraudster] / 366 / 24
 
         # scale by current month
-        num_trans_month = num_transactions * 12 * self.parameters['frac_month'][self.curr_global_date.month - 1, fraudster]
+        num_trans_month = num_transactions * 12 * self.parameters['frac_month'][self.local_calendar.get_global_month(self.curr_global_hour), fraudster]
         num_transactions = (1 - self.parameters['noise_level']) * num_trans_month + \
                            self.parameters['noise_level'] * num_transactions
 
         # estimate how many customers on avg left; this many we will add
-        num_new_customers = num_transactions * (1 - self.parameters['stay_prob'][fraudster])
+        num_new_customers = num_transactions * (1 - self.parameters['stay_prob'][fraudster]) * self.population_share
 
         # weigh by mean satisfaction
-        social_satisfaction = np.mean([c.satisfaction for c in self.customers])
-        num_new_customers *= social_satisfaction
+        num_new_customers *= self.get_social_satisfaction()
 
         if num_new_customers > 1:
             num_new_customers += self.random_state.normal(0, 1)
@@ -147,7 +487,22 @@ class TransactionModel(Model):
                 num_new_customers = 0
 
         # add as many customers as we think that left
-        self.customers.extend([GenuineCustomer(self) for _ in range(num_new_customers)])
+        self.add_customers(num_new_customers)
+
+    def get_social_satisfaction(self):
+        return self.customers.get_mean_satisfaction()
+
+    def add_customers(self, num_customers):
+        """
+        Adds n new genuine customers to the simulation
+
+        :param num_customers:
+            The number n of new customers to add
+        """
+        new_customers = [GenuineCustomer(self) for _ in range(num_customers)]
+        self.customers.extend(new_customers)
+        for customer in new_customers:
+            self.schedule.add(customer)
 
     def immigration_fraudsters(self):
 
@@ -155,12 +510,12 @@ class TransactionModel(Model):
         # estimate how many fraudulent transactions there were
         num_transactions = self.parameters['trans_per_year'][fraudster] / 366 / 24
         # scale by current month
-        num_trans_month = num_transactions * 12 * self.parameters['frac_month'][self.curr_global_date.month - 1, fraudster]
+        num_trans_month = num_transactions * 12 * self.parameters['frac_month'][self.local_calendar.get_global_month(self.curr_global_hour), fraudster]
         num_transactions = (1 - self.parameters['noise_level']) * num_trans_month + \
                            self.parameters['noise_level'] * num_transactions
 
         # estimate how many fraudsters on avg left
-        num_fraudsters_left = num_transactions * (1 - self.parameters['stay_prob'][fraudster])
+        num_fraudsters_left = num_transactions * (1 - self.parameters['stay_prob'][fraudster]) * self.population_share
 
         if num_fraudsters_left > 1:
             num_fraudsters_left += self.random_state.normal(0, 1)
@@ -182,16 +537,112 @@ class TransactionModel(Model):
         :param num_fraudsters:
             The number n of new fraudsters to add
         """
-        self.fraudsters.extend([FraudulentCustomer(self) for _ in range(num_fraudsters)])
+        new_fraudsters = [FraudulentCustomer(self) for _ in range(num_fraudsters)]
+        self.fraudsters.extend(new_fraudsters)
+        for fraudster in new_fraudsters:
+            self.schedule.add(fraudster)
 
     def initialise_merchants(self):
         return [Merchant(i, self) for i in range(self.parameters["num_merchants"])]
 
+    def initialise_agent_state(self):
+        """
+        Set up what the customers/fraudsters share through the model: the card indices, the victim pool,
+        the block of transaction profiles, the country tables, and the agents that leave or wait for authorisation
+        """
+        self.customers_by_card = dict()
+        self.fraudsters_by_card = dict()
+        self.victim_pool = self.initialise_victim_pool()
+        self.departures = []
+        self.pending_transactions = None
+        self.profiles = ProfileBlock()
+        self.country_tables = self.initialise_country_tables()
+
+    def initialise_category_codes(self):
+        """
+        Countries and currencies are represented by integer codes (see parameters.get_category_labels)
+        in the agents and the logs; the labels are only needed to read the parameters and to export the logs
+        """
+        self.country_labels, self.currency_labels = parameters.get_category_labels(self.parameters)
+        self.country_codes = {c: i for i, c in enumerate(self.country_labels)}
+        self.currency_codes = {c: i for i, c in enumerate(self.currency_labels)}
+
+    def initialise_merchant_tables(self):
+        """
+        Per fraudster and currency, the merchant IDs and the cumulative probabilities of buying
+        from them, so that customers can pick a merchant with one searchsorted over a uniform draw
+        :return:    list (genuine, fraudulent) of dicts from currency code to (merchant IDs, cumulative probabilities)
+        """
+        merchant_tables = []
+        for merchant_per_currency in self.parameters['merchant_per_currency']:
+            tables = dict()
+            for currency in merchant_per_currency.index.get_level_values(0).unique():
+                merchant_prob = merchant_per_currency.loc[currency]
+                cum_prob = np.cumsum(merchant_prob.values.flatten())
+                tables[self.currency_codes[currency]] = (merchant_prob.index.values, cum_prob / cum_prob[-1])
+            merchant_tables.append(tables)
+        return merchant_tables
+
+    def initialise_country_tables(self):
+        """
+        Per fraudster, the cumulative probabilities of the country codes
+        :return:    list (genuine, fraudulent) of arrays with the cumulative probabilities
+        """
+        country_frac = self.parameters['country_frac']
+        country_tables = []
+        for fraudster in range(2):
+            cum_prob = np.cumsum(country_frac.iloc[:, fraudster].values)
+            country_tables.append(cum_prob / cum_prob[-1])
+        return country_tables
+
+    def initialise_currency_tables(self):
+        """
+        Per fraudster and country, the currency codes and the cumulative probabilities of using them
+        :return:    list (genuine, fraudulent) of dicts from country code to (currency codes, cumulative probabilities)
+        """
+        currency_tables = []
+        for currency_per_country in self.parameters['currency_per_country']:
+            tables = dict()
+            for country in currency_per_country.index.get_level_values(0).unique():
+                currency_prob = currency_per_country.loc[country]
+                codes = np.array([self.currency_codes[c] for c in currency_prob.index.values])
+                cum_prob = np.cumsum(currency_prob.values.flatten())
+                tables[self.country_codes[country]] = (codes, cum_prob / cum_prob[-1])
+            currency_tables.append(tables)
+        return currency_tables
+
+    def initialise_victim_pool(self):
+        """
+        Pool of customers whose card can be stolen: fraudsters pick customers from a familiar
+        country and currency that have already made a transaction
+        """
+        country_frac = self.parameters['country_frac']
+        fraudster_countries = country_frac.index[country_frac['fraud'] != 0].values
+        fraudster_currencies = self.parameters['currency_per_country'][1].index.get_level_values(1).unique()
+        return VictimPool([self.country_codes[c] for c in fraudster_countries],
+                          [self.currency_codes[c] for c in fraudster_currencies])
+
     def initialise_customers(self):
-        return [GenuineCustomer(self) for _ in range(self.parameters['num_customers'])]
+        return AgentPopulation([GenuineCustomer(self) for _ in range(self.parameters['num_customers'])], track_satisfaction=True)
 
     def initialise_fraudsters(self):
-        return [FraudulentCustomer(self) for _ in range(self.parameters["num_fraudsters"])]
+        return AgentPopulation([FraudulentCustomer(self) for _ in range(self.parameters["num_fraudsters"])])
+
+    def initialise_schedule(self, scheduler):
+        """
+        Set up the scheduler, with all customers and fraudsters as its agents.
+        The agents are kept up to date during migration, so they don't have to be collected every step.
+        :param scheduler:   mesa scheduler to use (RandomActivation if None), e.g. a NextTransactionScheduler
+        """
+        schedule = scheduler if scheduler is not None else RandomActivation(self)
+        if schedule.model is None:
+            schedule.model = self
+        schedule.agents = AgentPopulation()
+        for agent in self.customers:
+            schedule.add(agent)
+        for agent in self.fraudsters:
+            schedule.add(agent)
+        return schedule
 
     def get_next_customer_id(self, fraudster):
         if not fraudster:
@@ -0,0 +1,257 @@
+from simulator.transaction_model import TransactionModel
+from mesa.time import RandomActivation
+from simulator.log_collector import TransactionBatchLogCollector, TRANSACTION_LOG_DTYPES, TRANSACTION_LOG_DATETIMES
+from simulator.population import CustomerPopulation, TransactionCustomers
+from authenticators.simple_authenticators import NeverSecondAuthenticator
+import numpy as np
+
+
+class VectorizedTransactionModel(TransactionModel):
+    """
+    Struct-of-arrays backend for the TransactionModel.
+    Instead of one agent object per customer, all customers (and all fraudsters) are held
+    in a CustomerPopulation, and the hourly decide/merchant/amount/stay phases run as batched
+    array operations. The authenticator gets the transactions of a step as arrays; authenticators that
+    authorise per transaction get a CustomerView per transaction, so they can be used unchanged.
+    The transaction logs have the same schema as the ones of the agent-based TransactionModel.
+
+    Note that the populations use the random state of the model instead of one random state
+    per customer, so runs are reproducible per seed but not identical to the agent-based model.
+    """
+    def __init__(self, model_parameters, authenticator=NeverSecondAuthenticator(), scheduler=None, log_sink=None):
+        # the transactions of the current step (filled in step_agents)
+        self.curr_transactions = None
+        super().__init__(model_parameters, authenticator, scheduler, log_sink)
+
+    @staticmethod
+    def initialise_log_collector():
+        return TransactionBatchLogCollector(
+            agent_reporters={"Global_Date": lambda t: t['global_date'],
+                             "Local_Date": lambda t: t['local_date'],
+                             "CardID": lambda t: t['card_id'],
+                             "MerchantID": lambda t: t['merchant_id'],
+                             "Amount": lambda t: t['amount'],
+                             "Currency": lambda t: t['currency'],
+                             "Country": lambda t: t['country'],
+                             "Target": lambda t: t['fraudster'],
+                             "AuthSteps": lambda t: t['auth_steps'],
+                             "TransactionCancelled": lambda t: t['cancelled'],
+                             "TransactionSuccessful": lambda t: ~t['cancelled']},
+            model_reporters={
+                "Satisfaction": lambda m: np.mean(m.customers.satisfaction)},
+            agent_dtypes=TRANSACTION_LOG_DTYPES,
+            datetime_vars=TRANSACTION_LOG_DATETIMES)
+
+    def initialise_code_tables(self):
+        """
+        Build the lookup tables that are indexed by merchant IDs and country/currency codes
+        (the codes themselves are assigned in TransactionModel.initialise_category_codes)
+        """
+        # the maximal amount per merchant ID (for the patience of customers asked for authentication)
+        self.merchant_max_amounts = np.zeros(max(self.merchants_by_id) + 1)
+        for merchant_id, merchant in self.merchants_by_id.items():
+            self.merchant_max_amounts[merchant_id] = merchant.max_amount
+
+        # countries and currencies fraudsters are familiar with (for picking fraud targets)
+        fraud_countries = self.parameters['country_frac'].index[self.parameters['country_frac']['fraud'] != 0].values
+        self.fraud_country_mask = np.isin(self.country_labels, fraud_countries)
+        fraud_currencies = self.parameters['currency_per_country'][1].index.get_level_values(1).unique()
+        self.fraud_currency_mask = np.isin(self.currency_labels, fraud_currencies)
+
+    def sample_from_tables(self, keys, tables):
+        """
+        For every key, draw one value from the discrete distribution tables[key]
+        :param keys:    integer array of keys
+        :param tables:  dict from key to (values, cumulative probabilities ending in 1)
+        :return:        array with the drawn values
+        """
+        samples = np.zeros(len(keys), dtype=np.int64)
+        uniform = self.random_state.uniform(0, 1, size=len(keys))
+        for key in np.unique(keys):
+            idx = np.flatnonzero(keys == key)
+            values, cum_prob = tables[key]
+            samples[idx] = values[np.searchsorted(cum_prob, uniform[idx], side='right')]
+        return samples
+
+    def sample_currencies(self, countries, fraudster):
+        return self.sample_from_tables(countries, self.currency_tables[fraudster])
+
+    def sample_merchants(self, currencies, fraudster):
+        return self.sample_from_tables(currencies, self.merchant_tables[fraudster])
+
+    def sample_amounts(self, merchant_ids, fraudster):
+        """
+        Draw the amounts of a batch of transactions, with one draw per merchant
+        :param merchant_ids:    merchant ID per transaction
+        :param fraudster:       whether the customers are genuine (0) or fraudulent (1)
+        :return:                array with the amount per transaction
+        """
+        amounts = np.zeros(len(merchant_ids), dtype=np.float64)
+        for merchant_id in np.unique(merchant_ids):
+            idx = np.flatnonzero(merchant_ids == merchant_id)
+            amounts[idx] = self.merchants_by_id[merchant_id].get_amounts(fraudster, len(idx))
+        return amounts
+
+    def step_agents(self):
+        local_day = self.local_calendar.get_local_days(self.curr_global_hour)
+        month, day, weekday, hour = self.local_calendar.get_local_times(self.curr_global_hour)
+
+        # decide which customers/fraudsters make a transaction
+        populations = [self.customers, self.fraudsters]
+        active = []
+        for population in populations:
+            country = population.country
+            active.append(population.decide_making_transaction(local_day[country], month[country], day[country], weekday[country], hour[country]))
+
+        # if this is the first transaction, we assign a card ID
+        self.assign_card_ids(self.customers, active[0])
+        self.assign_fraud_card_ids(active[1])
+
+        # pick merchants and amounts
+        merchant_ids = [self.sample_merchants(p.currency[idx], p.fraudster) for p, idx in zip(populations, active)]
+        amounts = [self.sample_amounts(m_ids, p.fraudster) for p, m_ids in zip(populations, merchant_ids)]
+
+        # authorise all transactions in one call, and apply the authentications per population
+        self.authorise_batch(populations, active, merchant_ids, amounts)
+
+        # store the current transactions for the logs
+        def gather(field):
+            return np.concatenate([getattr(p, field)[idx] for p, idx in zip(populations, active)])
+        countries = gather('country')
+        self.curr_transactions = {
+            'unique_id': gather('unique_id'),
+            'fraudster': np.concatenate([np.full(len(idx), p.fraudster) for p, idx in zip(populations, active)]),
+            'card_id': gather('card_id'),
+            'merchant_id': np.concatenate(merchant_ids),
+            'amount': np.concatenate(amounts),
+            'currency': gather('currency'),
+            'country': countries,
+            'global_date': np.full(len(countries), self.local_calendar.get_global_epoch_second(self.curr_global_hour), dtype=np.int64),
+            'local_date': self.local_calendar.get_local_epoch_seconds(self.curr_global_hour)[countries],
+            'auth_steps': gather('curr_auth_step'),
+            'cancelled': gather('curr_trans_cancelled'),
+        }
+
+        # decide whether to stay (and update satisfaction)
+        for population, idx in zip(populations, active):
+            population.post_process_transaction(idx)
+
+    def get_customer_view(self, population, idx, merchant_id, amount):
+        """
+        :return:    a CustomerView of a customer, with the fields of its current transaction set
+        """
+        customer = population[idx]
+        customer.curr_merchant = self.merchants_by_id[merchant_id]
+        customer.curr_amount = amount
+        return customer
+
+    def authorise_batch(self, populations, active, merchant_ids, amounts):
+        """
+        Authorise the transactions of this step with one call to the authorise_batch of the authenticator,
+        and ask the selected customers for authentication in bulk
+        :param populations:     the populations of customers and fraudsters
+        :param active:          per population, the indices of the customers that make a transaction
+        :param merchant_ids:    per population, the merchant ID per transaction
+        :param amounts:         per population, the amount per transaction
+        """
+        transactions = {
+            'customers': TransactionCustomers(self, populations, active, merchant_ids, amounts),
+            'amount': np.concatenate(amounts),
+            'merchant_id': np.concatenate(merchant_ids),
+            'country': np.concatenate([p.country[idx] for p, idx in zip(populations, active)]),
+            'currency': np.concatenate([p.currency[idx] for p, idx in zip(populations, active)]),
+            'card_id': np.concatenate([p.card_id[idx] for p, idx in zip(populations, active)]),
+            'fraudster': np.concatenate([np.full(len(idx), p.fraudster) for p, idx in zip(populations, active)])}
+        authenticate = np.asarray(self.authenticator.authorise_batch(transactions, self), dtype=bool)
+
+        start = 0
+        for population, idx, m_ids, a in zip(populations, active, merchant_ids, amounts):
+            selected = np.flatnonzero(authenticate[start:start + len(idx)])
+            population.give_authentications(idx[selected], a[selected], self.merchant_max_amounts[m_ids[selected]])
+            start += len(idx)
+
+    def assign_card_ids(self, population, idx):
+        """
+        Assign new card IDs to the customers that don't have one yet
+        :param population:  the population of customers
+        :param idx:         indices of customers that make a transaction
+        """
+        new_cards = idx[population.card_id[idx] < 0]
+        population.card_id[new_cards] = np.arange(self.next_card_id, self.next_card_id + len(new_cards))
+        self.next_card_id += len(new_cards)
+
+    def assign_fraud_card_ids(self, idx):
+        """
+        Fraudsters pick a card either by using a card from an existing customer,
+        or a completely new one (see FraudulentCustomer.initialise_card_id)
+        :param idx:     indices of fraudsters that make a transaction
+        """
+        new_cards = idx[self.fraudsters.card_id[idx] < 0]
+        steal = self.parameters['fraud_cards_in_genuine'] > self.random_state.uniform(0, 1, size=len(new_cards))
+
+        # customers from a familiar country and currency that have already made a transaction
+        # (only looked up when a fraudster actually wants to steal a card)
+        targets = np.zeros(0, dtype=np.int64)
+        if np.any(steal):
+            targets = np.flatnonzero((self.customers.card_id >= 0) &
+                                     self.fraud_country_mask[self.customers.country] &
+                                     self.fraud_currency_mask[self.customers.currency])
+
+        # if there are no targets, the fraudsters get their own credit card
+        if len(targets) > 0:
+            thieves = new_cards[steal]
+            victims = targets[self.random_state.randint(0, len(targets), size=len(thieves))]
+            self.fraudsters.card_id[thieves] = self.customers.card_id[victims]
+            self.fraudsters.country[thieves] = self.customers.country[victims]
+            self.fraudsters.currency[thieves] = self.customers.currency[victims]
+            new_cards = new_cards[~steal]
+
+        self.assign_card_ids(self.fraudsters, new_cards)
+
+    def inform_attacked_customers(self):
+        # like in the agent-based model, transactions are not reported as successful,
+        # so fraudsters don't corrupt cards
+        pass
+
+    def emigration(self):
+        self.customers.emigration()
+        self.fraudsters.emigration()
+
+    def get_transaction_counts(self):
+        batch = self.curr_transactions
+        # fraudsters can't authenticate, so for them the transaction got cancelled
+        num_authentications = np.sum(batch['auth_steps']) + np.sum((batch['fraudster'] == 1) & batch['cancelled'])
+        num_fraud_successes = np.sum((batch['fraudster'] == 1) & ~batch['cancelled'])
+        return len(batch['card_id']), int(num_authentications), int(num_fraud_successes)
+
+    def get_social_satisfaction(self):
+        return np.mean(self.customers.satisfaction)
+
+    def add_customers(self, num_customers):
+        self.customers.add(num_customers)
+
+    def add_fraudsters(self, num_fraudsters):
+        self.fraudsters.add(num_fraudsters)
+
+    def initialise_schedule(self, scheduler):
+        # the populations are stepped in step_agents, not by the scheduler
+        schedule = scheduler if scheduler is not None else RandomActivation(self)
+        if schedule.model is None:
+            schedule.model = self
+        return schedule
+
+    def initialise_agent_state(self):
+        # the populations don't use the card indices, victim pool, profiles and country tables of the agents;
+        # they only need the tables indexed by merchant IDs and codes
+        self.initialise_code_tables()
+
+    def initialise_customers(self):
+        customers = CustomerPopulation(self, fraudster=False)
+        customers.add(self.parameters['num_customers'])
+        return customers
+
+    def initialise_fraudsters(self):
+        fraudsters = CustomerPopulation(self, fraudster=True)
+        fraudsters.add(self.parameters['num_fraudsters'])
+        return fraudsters
+
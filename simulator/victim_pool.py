@@ -0,0 +1,62 @@
+class VictimPool:
+    """
+    Pool of genuine customers whose card can be stolen by fraudsters, i.e., customers that
+    already made a transaction and are from a country and currency that fraudsters know.
+    The pool is kept up to date as cards are assigned and customers leave, so that picking
+    a target is a single random index instead of a scan over all customers.
+    """
+    def __init__(self, countries, currencies):
+        """
+        :param countries:   the codes of the countries fraudsters are familiar with
+        :param currencies:  the codes of the currencies fraudsters are familiar with
+        """
+        self.countries = set(countries)
+        self.currencies = set(currencies)
+
+        # the customers in the pool, and the position of each customer (by unique ID) in that list
+        self.customers = []
+        self.position = dict()
+
+    def __len__(self):
+        return len(self.customers)
+
+    def is_eligible(self, customer):
+        return (customer.country_code in self.countries) and (customer.currency_code in self.currencies)
+
+    def add(self, customer):
+        """
+        Add a customer to the pool if it is a possible target
+        :param customer:    a genuine customer that just got a card ID
+        """
+        if self.is_eligible(customer) and customer.unique_id not in self.position:
+            self.position[customer.unique_id] = len(self.customers)
+            self.customers.append(customer)
+
+    def remove(self, customer):
+        """
+        Remove a customer from the pool (if it is in there), by moving the last customer to its place
+        :param customer:    the customer to remove
+        """
+        self.remove_id(customer.unique_id)
+
+    def remove_id(self, unique_id):
+        """
+        Remove the customer with the given unique ID from the pool (if it is in there)
+        """
+        pos = self.position.pop(unique_id, None)
+        if pos is None:
+            return
+        last = self.customers.pop()
+        if pos < len(self.customers):
+            self.customers[pos] = last
+            self.position[last.unique_id] = pos
+
+    def choice(self, random_state):
+        """
+        Pick a random customer from the pool
+        :param random_state:    the random stream (numpy Generator) to draw from
+        :return:                a customer (None if the pool is empty)
+        """
+        if len(self.customers) == 0:
+            return None
+        return self.customers[random_state.integers(0, len(self.customers))]
@@ -0,0 +1,33 @@
+import sys
+from os.path import dirname, abspath
+from datetime import datetime
+from pytz import timezone
+import pytest
+
+# the tests import the packages of the repository (simulator, authenticators, experiments)
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from simulator import parameters
+
+
+def get_small_parameters(num_days=3, num_customers=300, num_fraudsters=30, seed=666):
+    """
+    :return:    the default parameters, with a small population and a short simulation period
+    """
+    params = parameters.get_default_parameters()
+    params['end_date'] = datetime(2016, 1, num_days).replace(tzinfo=timezone('US/Pacific'))
+    params['num_customers'] = num_customers
+    params['num_fraudsters'] = num_fraudsters
+    params['seed'] = seed
+    return params
+
+
+@pytest.fixture
+def small_parameters():
+    return get_small_parameters()
+
+
+def run_to_end(model):
+    while not model.terminated:
+        model.step()
+    return model
@@ -0,0 +1,38 @@
+import random
+import pytest
+from simulator.transaction_model import TransactionModel
+from simulator.vectorized_model import VectorizedTransactionModel
+from simulator.event_scheduler import NextTransactionScheduler
+from authenticators.simple_authenticators import HeuristicAuthenticator
+from conftest import run_to_end
+
+
+def get_output(model):
+    log = model.log_collector.get_agent_vars_dataframe()
+    return log.to_csv().encode(), model.log_collector.get_model_vars_dataframe().to_csv().encode()
+
+
+@pytest.mark.parametrize('model_class, scheduler_class', [(TransactionModel, None),
+                                                          (TransactionModel, NextTransactionScheduler),
+                                                          (VectorizedTransactionModel, None)])
+def test_resumed_run_is_identical(model_class, scheduler_class, small_parameters, tmp_path):
+    """ Saving a checkpoint halfway and resuming from it gives the same output as an uninterrupted run """
+    def new_model():
+        scheduler = scheduler_class() if scheduler_class is not None else None
+        return model_class(dict(small_parameters), HeuristicAuthenticator(50), scheduler=scheduler)
+
+    uninterrupted = get_output(run_to_end(new_model()))
+
+    path = str(tmp_path / 'checkpoint.pkl')
+    model = new_model()
+    for _ in range(30):
+        model.step()
+    model.save_checkpoint(path)
+
+    # continue the original a bit further, so the global random generator moves on
+    for _ in range(5):
+        model.step()
+    random.random()
+
+    resumed = get_output(run_to_end(model_class.load_checkpoint(path)))
+    assert resumed == uninterrupted
@@ -0,0 +1,56 @@
+import numpy as np
+from simulator.event_scheduler import NextTransactionScheduler
+
+
+class HourlyAgent:
+    """ Agent that makes a transaction with a probability per hour of the day (like the customers) """
+    def __init__(self, model, unique_id, trans_prob_hour):
+        self.model = model
+        self.random_state = np.random.RandomState(unique_id)
+        self.trans_prob_hour = trans_prob_hour
+        self.transaction_prob_bound = 1.
+        self.stay = True
+
+    def get_max_transaction_prob(self):
+        return np.max(self.trans_prob_hour)
+
+    def step(self):
+        self.model.num_steps += 1
+        # like BaseCustomer.decide_making_transaction, the probability is relative to the bound of the scheduler
+        prob = self.trans_prob_hour[self.model.curr_global_hour % 24]
+        if prob > self.random_state.uniform(0, self.transaction_prob_bound):
+            self.model.transactions[self.model.curr_global_hour % 24] += 1
+
+
+class HourlyModel:
+    def __init__(self):
+        self.curr_global_hour = 0
+        self.random_state = np.random.RandomState(0)
+        self.transactions = np.zeros(24, dtype=np.int64)
+        self.num_steps = 0
+
+    def complete_pending_transactions(self):
+        pass
+
+
+def test_thinning_matches_hourly_rate():
+    """ The number of transactions per hour of the day is the one of a Bernoulli draw in every hour """
+    num_agents, num_days = 2000, 100
+    trans_prob_hour = 0.01 * (1 + np.sin(np.arange(24) / 24 * 2 * np.pi))
+
+    model = HourlyModel()
+    scheduler = NextTransactionScheduler(model)
+    for unique_id in range(num_agents):
+        scheduler.add(HourlyAgent(model, unique_id, trans_prob_hour))
+    for hour in range(24 * num_days):
+        model.curr_global_hour = hour
+        scheduler.step()
+
+    # binomial number of transactions per hour of the day, within 5 standard deviations
+    trials = num_agents * num_days
+    expected = trials * trans_prob_hour
+    std = np.sqrt(trials * trans_prob_hour * (1 - trans_prob_hour))
+    assert np.all(np.abs(model.transactions - expected) <= 5 * std + 1)
+
+    # the agents are only woken up in a fraction of the hours (about the maximal probability per hour)
+    assert model.num_steps < 0.05 * trials * 24
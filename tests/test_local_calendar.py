@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from pytz import timezone, country_timezones
+import pytest
+from simulator import parameters
+from simulator.local_calendar import LocalCalendar
+
+
+COUNTRIES = parameters.get_default_parameters()['country_frac'].index.values
+
+START_DATES = {
+    # like the default parameters: replace() gives US/Pacific its local mean time (-7:53)
+    'lmt': datetime(2016, 1, 1).replace(tzinfo=timezone('US/Pacific')),
+    'localized': timezone('US/Pacific').localize(datetime(2016, 1, 1)),
+    'utc_dst_start': timezone('UTC').localize(datetime(2016, 3, 26, 20)),
+}
+
+
+@pytest.mark.parametrize('start', sorted(START_DATES))
+def test_local_calendar_matches_pytz(start):
+    """ For every country, the table gives the same local time as converting the global date with pytz """
+    start_date = START_DATES[start]
+    # small blocks, so the table is rebuilt a few times
+    calendar = LocalCalendar(start_date, COUNTRIES, block_size=24 * 40)
+    local_timezones = {c: timezone(country_timezones(c)[0]) for c in COUNTRIES}
+
+    # every 5 hours over more than a year, which covers the DST changes of all timezones
+    for global_hour in range(0, 24 * 400, 5):
+        global_date = start_date + timedelta(hours=global_hour)
+        assert calendar.get_global_epoch_second(global_hour) == \
+            LocalCalendar.get_epoch_second(global_date.replace(tzinfo=None))
+        for country_idx, country in enumerate(COUNTRIES):
+            local_date = global_date.astimezone(local_timezones[country]).replace(tzinfo=None)
+            assert calendar.get_local_time(country_idx, global_hour) == \
+                (local_date.month - 1, local_date.day - 1, local_date.weekday(), local_date.hour)
+            assert calendar.get_local_epoch_second(country_idx, global_hour) == LocalCalendar.get_epoch_second(local_date)
+            assert calendar.get_local_datetime(country_idx, global_hour) == local_date
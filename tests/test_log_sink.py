@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+from simulator.transaction_model import TransactionModel
+from simulator.vectorized_model import VectorizedTransactionModel
+from simulator.log_sink import CsvLogSink, iter_log_chunks
+from conftest import run_to_end
+
+
+@pytest.mark.parametrize('model_class', [TransactionModel, VectorizedTransactionModel])
+def test_iter_log_chunks_round_trips_log(model_class, small_parameters, tmp_path):
+    """ The chunks written by a CsvLogSink read back into the same log as the one kept in memory """
+    in_memory = run_to_end(model_class(dict(small_parameters))).log_collector.get_agent_vars_dataframe()
+
+    folder = str(tmp_path / 'log')
+    run_to_end(model_class(dict(small_parameters), log_sink=CsvLogSink(folder, max_steps=24)))
+    chunks = list(iter_log_chunks(folder))
+
+    assert len(chunks) == 3
+    pd.testing.assert_frame_equal(pd.concat(chunks), in_memory)
+
+
+def test_flush_log_writes_collected_transactions(small_parameters, tmp_path):
+    """ flush_log writes the transactions of a run that is stopped before termination """
+    folder = str(tmp_path / 'log')
+    model = TransactionModel(small_parameters, log_sink=CsvLogSink(folder, max_steps=24))
+    for _ in range(30):
+        model.step()
+    model.flush_log()
+
+    log = pd.concat(iter_log_chunks(folder))
+    assert log.index.get_level_values('Step').max() == 29
@@ -0,0 +1,40 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+from authenticators.simple_authenticators import HeuristicAuthenticator, NeverSecondAuthenticator
+from experiments.parallel_runner import make_grid, run_experiments
+from simulator.sharded_model import ShardedSimulation
+from simulator.event_scheduler import NextTransactionScheduler
+from conftest import get_small_parameters
+
+
+def run_sharded(num_shards, scheduler_factory=None):
+    with ShardedSimulation(get_small_parameters(), num_shards=num_shards, authenticator_factory=partial(HeuristicAuthenticator, 50),
+                           scheduler_factory=scheduler_factory, poll_seconds=0.1) as simulation:
+        simulation.run()
+        return simulation.get_agent_vars_dataframe(), simulation.get_model_vars_dataframe()
+
+
+def test_sharded_runs_are_reproducible():
+    """ Two sharded runs with the same seed and number of shards give the same logs """
+    for scheduler_factory in (None, NextTransactionScheduler):
+        agent_vars, model_vars = run_sharded(2, scheduler_factory)
+        agent_vars_again, model_vars_again = run_sharded(2, scheduler_factory)
+        assert len(agent_vars) > 0
+        pd.testing.assert_frame_equal(agent_vars, agent_vars_again)
+        pd.testing.assert_frame_equal(model_vars, model_vars_again)
+
+
+def test_parallel_runs_are_reproducible(tmp_path):
+    """ The rewards of a grid don't depend on the number of workers (or on which worker did which run) """
+    runs = make_grid({'small': get_small_parameters()},
+                     {'never_second': NeverSecondAuthenticator, 'heuristic': partial(HeuristicAuthenticator, 50)},
+                     seeds=[1, 2])
+    parallel = run_experiments(runs, str(tmp_path / 'parallel'), num_workers=2)
+    sequential = run_experiments(runs, str(tmp_path / 'sequential'), num_workers=1)
+
+    assert sorted(parallel) == sorted(sequential)
+    for key in parallel:
+        assert sorted(parallel[key]) == sorted(sequential[key])
+        for reward in parallel[key]:
+            np.testing.assert_array_equal(parallel[key][reward], sequential[key][reward])
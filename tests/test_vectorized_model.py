@@ -0,0 +1,42 @@
+from authenticators.simple_authenticators import HeuristicAuthenticator
+from authenticators.abstract_authenticator import AbstractAuthenticator
+from simulator.transaction_model import TransactionModel
+from simulator.vectorized_model import VectorizedTransactionModel
+from conftest import run_to_end
+
+
+class PerTransactionAuthenticator(AbstractAuthenticator):
+    """ Like the HeuristicAuthenticator, but without authorise_batch """
+    def authorise_transaction(self, customer):
+        if customer.curr_amount > 50:
+            customer.give_authentication()
+
+
+def get_index_dtypes(log):
+    return [log.index.get_level_values(i).dtype for i in range(log.index.nlevels)]
+
+
+def test_log_schema_matches_agent_model(small_parameters):
+    """ The vectorized model writes logs with the same columns, index and dtypes as the agent-based model """
+    agent_model = run_to_end(TransactionModel(small_parameters, HeuristicAuthenticator(50)))
+    vectorized_model = run_to_end(VectorizedTransactionModel(small_parameters, HeuristicAuthenticator(50)))
+
+    for get_log in (lambda m: m.log_collector.get_agent_vars_dataframe(),
+                    lambda m: m.log_collector.get_model_vars_dataframe()):
+        agent_log, vectorized_log = get_log(agent_model), get_log(vectorized_model)
+        assert len(vectorized_log) > 0
+        assert list(vectorized_log.index.names) == list(agent_log.index.names)
+        assert get_index_dtypes(vectorized_log) == get_index_dtypes(agent_log)
+        assert vectorized_log.columns.tolist() == agent_log.columns.tolist()
+        # this also compares the categories of the categorical columns
+        assert vectorized_log.dtypes.tolist() == agent_log.dtypes.tolist()
+
+
+def test_default_authorise_batch_gives_same_log(small_parameters):
+    """ An authenticator that only authorises per transaction gives the same log as its batched version """
+    for model_class in (TransactionModel, VectorizedTransactionModel):
+        batched = run_to_end(model_class(dict(small_parameters), HeuristicAuthenticator(50)))
+        per_transaction = run_to_end(model_class(dict(small_parameters), PerTransactionAuthenticator()))
+        batched_log = batched.log_collector.get_agent_vars_dataframe()
+        assert batched_log['AuthSteps'].sum() > 0
+        assert batched_log.equals(per_transaction.log_collector.get_agent_vars_dataframe())